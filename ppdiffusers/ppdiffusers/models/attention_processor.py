@@ -133,6 +133,9 @@ class Attention(nn.Layer):
         self.to_out.append(nn.Linear(inner_dim, query_dim, bias_attr=out_bias))
         self.to_out.append(nn.Dropout(dropout))
 
+        # set by `fuse_projections`, the processors then compute query, key and value with a single `qkv_weight` matmul
+        self.fused_projections = False
+
         # set attention processor
         if processor is None:
             processor = AttnProcessor()
@@ -258,6 +261,47 @@ class Attention(nn.Layer):
 
         self.processor = processor
 
+    @paddle.no_grad()
+    def fuse_projections(self):
+        r"""
+        Concatenate the weights of `to_q`, `to_k` and `to_v` into a single `qkv_weight` (and `qkv_bias`). Whenever
+        query, key and value are projected from the same hidden states, the processors then run one large matmul
+        instead of three small ones.
+
+        The fused weights are non-persistable buffers: they are not part of the `state_dict`, so saved checkpoints keep
+        the layout of the unfused layer. The separate layers are kept for the cross attention calls and the
+        checkpoints, which makes the fused weights one extra copy of the projections until
+        [`~Attention.unfuse_projections`]; call this again after changing the weights of the separate layers.
+        """
+        if self.to_k is None or self.to_v is None:
+            return
+        in_features = self.to_q.weight.shape[0]
+        if self.to_k.weight.shape[0] != in_features or self.to_v.weight.shape[
+                0] != in_features:
+            # pure cross attention, key and value never share the input of the query
+            return
+
+        # paddle stores linear weights as [in_features, out_features]
+        weight = paddle.concat(
+            [self.to_q.weight, self.to_k.weight, self.to_v.weight], axis=1)
+        bias = None
+        if self.to_q.bias is not None:
+            bias = paddle.concat(
+                [self.to_q.bias, self.to_k.bias, self.to_v.bias], axis=0)
+        self.register_buffer("qkv_weight", weight, persistable=False)
+        self.register_buffer("qkv_bias", bias, persistable=False)
+        self.fused_projections = True
+
+    def unfuse_projections(self):
+        r"""
+        Go back to separate `to_q`, `to_k` and `to_v` projections after [`~Attention.fuse_projections`] and release the
+        fused weights.
+        """
+        if self.fused_projections:
+            self._buffers.pop("qkv_weight")
+            self._buffers.pop("qkv_bias")
+            self.fused_projections = False
+
     def forward(
             self,
             hidden_states,
@@ -395,16 +439,21 @@ class AttnProcessor:
                                           encoder_hidden_states.shape)
         attention_mask = attn.prepare_attention_mask(
             attention_mask, sequence_length, batch_size)
-        query = attn.to_q(hidden_states)
 
-        if encoder_hidden_states is None:
-            encoder_hidden_states = hidden_states
-        elif attn.norm_cross:
-            encoder_hidden_states = attn.norm_encoder_hidden_states(
-                encoder_hidden_states)
+        if encoder_hidden_states is None and attn.fused_projections:
+            query, key, value = F.linear(hidden_states, attn.qkv_weight,
+                                         attn.qkv_bias).split(3, axis=-1)
+        else:
+            query = attn.to_q(hidden_states)
 
-        key = attn.to_k(encoder_hidden_states)
-        value = attn.to_v(encoder_hidden_states)
+            if encoder_hidden_states is None:
+                encoder_hidden_states = hidden_states
+            elif attn.norm_cross:
+                encoder_hidden_states = attn.norm_encoder_hidden_states(
+                    encoder_hidden_states)
+
+            key = attn.to_k(encoder_hidden_states)
+            value = attn.to_v(encoder_hidden_states)
 
         query = attn.head_to_batch_dim(query)
         key = attn.head_to_batch_dim(key)
@@ -655,7 +704,11 @@ class AttnAddedKVProcessor:
         hidden_states = attn.group_norm(hidden_states.transpose(
             [0, 2, 1])).transpose([0, 2, 1])
 
-        query = attn.to_q(hidden_states)
+        if attn.fused_projections:
+            query, key, value = F.linear(hidden_states, attn.qkv_weight,
+                                         attn.qkv_bias).split(3, axis=-1)
+        else:
+            query = attn.to_q(hidden_states)
         query = attn.head_to_batch_dim(query)
 
         encoder_hidden_states_key_proj = attn.add_k_proj(encoder_hidden_states)
@@ -667,8 +720,9 @@ class AttnAddedKVProcessor:
             encoder_hidden_states_value_proj)
 
         if not attn.only_cross_attention:
-            key = attn.to_k(hidden_states)
-            value = attn.to_v(hidden_states)
+            if not attn.fused_projections:
+                key = attn.to_k(hidden_states)
+                value = attn.to_v(hidden_states)
             key = attn.head_to_batch_dim(key)
             value = attn.head_to_batch_dim(value)
             key = paddle.concat([encoder_hidden_states_key_proj, key], axis=2)
@@ -724,7 +778,11 @@ class XFormersAttnAddedKVProcessor:
         hidden_states = attn.group_norm(hidden_states.transpose(
             [0, 2, 1])).transpose([0, 2, 1])
 
-        query = attn.to_q(hidden_states)
+        if attn.fused_projections:
+            query, key, value = F.linear(hidden_states, attn.qkv_weight,
+                                         attn.qkv_bias).split(3, axis=-1)
+        else:
+            query = attn.to_q(hidden_states)
         query = attn.head_to_batch_dim(query, transpose=False)
 
         encoder_hidden_states_key_proj = attn.add_k_proj(encoder_hidden_states)
@@ -736,8 +794,9 @@ class XFormersAttnAddedKVProcessor:
             encoder_hidden_states_value_proj, transpose=False)
 
         if not attn.only_cross_attention:
-            key = attn.to_k(hidden_states)
-            value = attn.to_v(hidden_states)
+            if not attn.fused_projections:
+                key = attn.to_k(hidden_states)
+                value = attn.to_v(hidden_states)
             key = attn.head_to_batch_dim(key, transpose=False)
             value = attn.head_to_batch_dim(value, transpose=False)
             key = paddle.concat([encoder_hidden_states_key_proj, key], axis=1)
@@ -789,16 +848,20 @@ class XFormersAttnProcessor:
         attention_mask = attn.prepare_attention_mask(
             attention_mask, sequence_length, batch_size, transpose=False)
 
-        query = attn.to_q(hidden_states)
+        if encoder_hidden_states is None and attn.fused_projections:
+            query, key, value = F.linear(hidden_states, attn.qkv_weight,
+                                         attn.qkv_bias).split(3, axis=-1)
+        else:
+            query = attn.to_q(hidden_states)
 
-        if encoder_hidden_states is None:
-            encoder_hidden_states = hidden_states
-        elif attn.norm_cross:
-            encoder_hidden_states = attn.norm_encoder_hidden_states(
-                encoder_hidden_states)
+            if encoder_hidden_states is None:
+                encoder_hidden_states = hidden_states
+            elif attn.norm_cross:
+                encoder_hidden_states = attn.norm_encoder_hidden_states(
+                    encoder_hidden_states)
 
-        key = attn.to_k(encoder_hidden_states)
-        value = attn.to_v(encoder_hidden_states)
+            key = attn.to_k(encoder_hidden_states)
+            value = attn.to_v(encoder_hidden_states)
 
         # if transpose = False, query's shape will be [batch_size, seq_len, num_head, head_dim]
         query = attn.head_to_batch_dim(query, transpose=False)
@@ -16,7 +16,7 @@ from typing import List, Optional, Tuple, Union
 
 import paddle
 
-from ...utils import logging, randn_tensor
+from ...utils import logging
 from ..pipeline_utils import AudioPipelineOutput, DiffusionPipeline
 
 logger = logging.get_logger(__name__)
@@ -32,11 +32,34 @@ class DanceDiffusionPipeline(DiffusionPipeline):
         scheduler ([`SchedulerMixin`]):
             A scheduler to be used in combination with `unet` to denoise the encoded image. Can be one of
             [`IPNDMScheduler`].
+        compile_model (`bool`, *optional*, defaults to `False`):
+            Whether to convert `unet` to a static graph with `paddle.jit.to_static` to speed up the denoising loop.
+        compile_mode (`str`, *optional*):
+            The `paddle.jit.to_static` backend used when `compile_model` is enabled, e.g. `"CINN"`.
     """
 
-    def __init__(self, unet, scheduler):
+    def __init__(self,
+                 unet,
+                 scheduler,
+                 compile_model: bool=False,
+                 compile_mode: Optional[str]=None):
         super().__init__()
         self.register_modules(unet=unet, scheduler=scheduler)
+        # paddle has no `inference_mode`, so at least make sure no layer runs in training mode
+        self.unet.eval()
+        if compile_model:
+            self.unet = self.compile_module(self.unet, compile_mode)
+
+    def freeze_shapes(self, batch_size: int, sample_size: Optional[int]=None):
+        r"""
+        Specialize the unet on `batch_size` audio samples of `sample_size` values, `self.unet.config.sample_size` by
+        default. `sample_size` is the length after padding to a multiple of the down scale factor of the unet. The
+        pipeline only accepts this batch size and length afterwards. With `chunk_size`, `batch_size` is the size of
+        every chunk fed to the unet, so the batch has to be a multiple of it.
+        """
+        sample_size = sample_size or self.unet.config.sample_size
+        self.freeze_unet_shape(
+            (batch_size, self.unet.config.in_channels, sample_size))
 
     @paddle.no_grad()
     def __call__(
@@ -46,64 +69,105 @@ class DanceDiffusionPipeline(DiffusionPipeline):
             generator: Optional[Union[paddle.Generator, List[
                 paddle.Generator]]]=None,
             audio_length_in_s: Optional[float]=None,
-            return_dict: bool=True, ) -> Union[AudioPipelineOutput, Tuple]:
+            return_dict: bool=True,
+            amp_dtype: Optional[str]=None,
+            chunk_size: Optional[int]=None, ) -> Union[AudioPipelineOutput, Tuple]:
         """
         Args:
             batch_size (`int`, *optional*, defaults to 1):
-                The number of audio samples to generate.
+                The number of audio samples to generate. The whole batch is denoised together, with a single unet
+                forward per step, which is much faster than calling the pipeline once per sample.
             num_inference_steps (`int`, *optional*, defaults to 50):
                 The number of denoising steps. More denoising steps usually lead to a higher quality audio sample at
                 the expense of slower inference.
             generator (`paddle.Generator`, *optional*):
-                One or a list of paddle generator(s) to make generation deterministic.
+                One or a list of paddle generator(s) to make generation deterministic. A list seeds each sample of the
+                batch individually, the samples are still denoised together. Paddle has no per-sample seeded random
+                kernel, so a list draws the initial noise with one kernel per sample, while a single generator draws
+                the whole batch at once.
             audio_length_in_s (`float`, *optional*, defaults to `self.unet.config.sample_size/self.unet.config.sample_rate`):
                 The length of the generated audio sample in seconds. Note that the output of the pipeline, *i.e.*
                 `sample_size`, will be `audio_length_in_s` * `self.unet.config.sample_rate`.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~pipelines.AudioPipelineOutput`] instead of a plain tuple.
+            amp_dtype (`str`, *optional*):
+                If set to `"float16"` or `"bfloat16"`, the denoising loop runs under `paddle.amp.auto_cast` with that
+                dtype. The latents and the final post-processing stay in the dtype of the model.
+            chunk_size (`int`, *optional*):
+                The maximum number of samples fed to the unet in one forward. Large batches are split into chunks of
+                this size once they stop getting faster or no longer fit in memory. Defaults to the whole batch.
 
         Returns:
             [`~pipelines.AudioPipelineOutput`] or `tuple`: [`~pipelines.utils.AudioPipelineOutput`] if `return_dict` is
             True, otherwise a `tuple. When returning a tuple, the first element is a list with the generated images.
         """
-        if audio_length_in_s is None:
-            audio_length_in_s = (self.unet.config.sample_size /
-                                 self.unet.config.sample_rate)
-        sample_size = audio_length_in_s * self.unet.config.sample_rate
+        # bind the config values once, the unet (and so its config) may be swapped between calls
+        unet_config = self.unet.config
+        sample_rate = unet_config.sample_rate
         down_scale_factor = 2**len(self.unet.up_blocks)
+        if audio_length_in_s is None:
+            audio_length_in_s = unet_config.sample_size / sample_rate
+        sample_size = audio_length_in_s * sample_rate
         if sample_size < 3 * down_scale_factor:
             raise ValueError(
-                f"{audio_length_in_s} is too small. Make sure it's bigger or equal to {3 * down_scale_factor / self.unet.config.sample_rate}."
+                f"{audio_length_in_s} is too small. Make sure it's bigger or equal to {3 * down_scale_factor / sample_rate}."
             )
         original_sample_size = int(sample_size)
         if sample_size % down_scale_factor != 0:
-            sample_size = (audio_length_in_s * self.unet.config.sample_rate //
-                           down_scale_factor + 1) * down_scale_factor
+            sample_size = (sample_size // down_scale_factor + 1
+                           ) * down_scale_factor
             logger.info(
-                f"{audio_length_in_s} is increased to {sample_size / self.unet.config.sample_rate} so that it can be handled by the model. It will be cut to {original_sample_size / self.unet.config.sample_rate} after the denoising process."
+                f"{audio_length_in_s} is increased to {sample_size / sample_rate} so that it can be handled by the model. It will be cut to {original_sample_size / sample_rate} after the denoising process."
             )
         sample_size = int(sample_size)
         dtype = self.unet.dtype
-        shape = batch_size, self.unet.config.in_channels, sample_size
+        shape = batch_size, unet_config.in_channels, sample_size
+        if chunk_size is None or chunk_size >= batch_size:
+            self.check_frozen_shape(shape)
+        else:
+            # the unet only sees the chunks, the last one is smaller when the batch is not a multiple of `chunk_size`
+            for chunk_batch_size in sorted({
+                    min(chunk_size, batch_size - j)
+                    for j in range(0, batch_size, chunk_size)
+            }):
+                self.check_frozen_shape(
+                    (chunk_batch_size, unet_config.in_channels, sample_size))
         if isinstance(generator, list) and len(generator) != batch_size:
             raise ValueError(
                 f"You have passed a list of generators of length {len(generator)}, but requested an effective batch size of {batch_size}. Make sure the batch size matches the length of the generators."
             )
-        audio = randn_tensor(shape, generator=generator, dtype=dtype)
+        audio = self.prepare_noise(shape, generator=generator, dtype=dtype)
         # set step values
         self.scheduler.set_timesteps(num_inference_steps)
         # TODO donot cast dtype here
         # self.scheduler.timesteps = self.scheduler.timesteps.cast(dtype)
 
-        for t in self.progress_bar(self.scheduler.timesteps):
-            # 1. predict noise model_output
-            model_output = self.unet(audio, t).sample
+        timesteps = self.scheduler.timesteps
+        # a single device-to-host copy: the scheduler then works on python scalars instead of syncing every step,
+        # while the unet keeps reading the timestep from the device
+        timesteps_host = timesteps.tolist()
+        with paddle.amp.auto_cast(
+                enable=amp_dtype is not None, dtype=amp_dtype or "float16"):
+            for i, t in enumerate(self.progress_bar(timesteps_host)):
+                # 1. predict noise model_output
+                if chunk_size is None or chunk_size >= batch_size:
+                    model_output = self.unet(audio, timesteps[i]).sample
+                else:
+                    model_output = paddle.concat(
+                        [
+                            self.unet(audio[j:j + chunk_size], timesteps[i])
+                            .sample for j in range(0, batch_size, chunk_size)
+                        ],
+                        axis=0, )
+                if model_output.dtype != audio.dtype:
+                    model_output = model_output.cast(audio.dtype)
 
-            # 2. compute previous image: x_t -> t_t-1
-            audio = self.scheduler.step(model_output, t, audio).prev_sample
+                # 2. compute previous image: x_t -> t_t-1
+                audio = self.scheduler.step(model_output, t, audio).prev_sample
 
-        audio = audio.clip(min=-1, max=1).astype(dtype="float32").cpu().numpy()
-        audio = audio[:, :, :original_sample_size]
+        # slice before the device-to-host copy so only the kept samples are transferred
+        audio = audio[:, :, :original_sample_size].clip(
+            min=-1, max=1).cast("float32").numpy()
         if not return_dict:
             return (audio, )
         return AudioPipelineOutput(audios=audio)
@@ -12,7 +12,6 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import inspect
 from typing import List, Optional, Tuple, Union
 
 import numpy as np
@@ -24,7 +23,8 @@ from ...schedulers import (
     DDIMScheduler, DPMSolverMultistepScheduler, EulerAncestralDiscreteScheduler,
     EulerDiscreteScheduler, LMSDiscreteScheduler, PNDMScheduler)
 from ...utils import PIL_INTERPOLATION, randn_tensor
-from ..pipeline_utils import DiffusionPipeline, ImagePipelineOutput
+from ..pipeline_utils import (DiffusionPipeline, ImagePipelineOutput,
+                              scheduler_step_parameters)
 
 
 def preprocess(image):
@@ -124,11 +124,8 @@ class LDMSuperResolutionPipeline(DiffusionPipeline):
         timesteps_tensor = self.scheduler.timesteps
         # scale the initial noise by the standard deviation required by the scheduler
         latents = latents * self.scheduler.init_noise_sigma
-        accepts_eta = "eta" in set(
-            inspect.signature(self.scheduler.step).parameters.keys())
-        extra_kwargs = {}
-        if accepts_eta:
-            extra_kwargs["eta"] = eta
+        accepts_eta = "eta" in scheduler_step_parameters(self.scheduler)
+        extra_kwargs = {"eta": eta} if accepts_eta else {}
         for t in self.progress_bar(timesteps_tensor):
             # concat latents and low resolution image in the channel dimension.
             latents_input = paddle.concat(x=[latents, image], axis=1)
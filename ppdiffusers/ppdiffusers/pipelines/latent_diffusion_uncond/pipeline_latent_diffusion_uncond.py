@@ -12,15 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import inspect
-from typing import List, Optional, Tuple, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 import paddle
 
 from ...models import UNet2DModel, VQModel
 from ...schedulers import DDIMScheduler
-from ...utils import randn_tensor
-from ..pipeline_utils import DiffusionPipeline, ImagePipelineOutput
+from ..paddle_infer_utils import (bind_trt_engine, bind_vqvae_decoder_engine,
+                                 build_trt_engine, build_vqvae_decoder_engine)
+from ..pipeline_utils import (DiffusionPipeline, ImagePipelineOutput,
+                              scheduler_step_parameters)
 
 
 class LDMPipeline(DiffusionPipeline):
@@ -34,14 +35,75 @@ class LDMPipeline(DiffusionPipeline):
         unet ([`UNet2DModel`]): U-Net architecture to denoise the encoded image latents.
         scheduler ([`SchedulerMixin`]):
             [`DDIMScheduler`] is to be used in combination with `unet` to denoise the encoded image latents.
+        compile_model (`bool`, *optional*, defaults to `False`):
+            Whether to convert `unet` and `vqvae.decode` to static graphs with `paddle.jit.to_static` to speed up
+            inference.
+        compile_mode (`str`, *optional*):
+            The `paddle.jit.to_static` backend used when `compile_model` is enabled, e.g. `"CINN"`.
+        trt_engine_path (`str`, *optional*):
+            Directory of a Paddle-TensorRT unet engine prepared with
+            [`~pipelines.paddle_infer_utils.build_trt_engine`]. If set, the unet forward runs through the engine.
+        trt_precision (`str`, *optional*, defaults to `"float16"`):
+            The precision of the TensorRT engine, one of `"int8"`, `"float16"` or `"float32"`.
+        trt_calibration_loader (`Iterable[Tuple[paddle.Tensor, paddle.Tensor]]`, *optional*):
+            `(sample, timestep)` pairs to calibrate an `"int8"` engine with. Only needed until the calibration table
+            is cached in `trt_engine_path`.
     """
 
     def __init__(self,
                  vqvae: VQModel,
                  unet: UNet2DModel,
-                 scheduler: DDIMScheduler):
+                 scheduler: DDIMScheduler,
+                 compile_model: bool=False,
+                 compile_mode: Optional[str]=None,
+                 trt_engine_path: Optional[str]=None,
+                 trt_precision: str="float16",
+                 trt_calibration_loader: Optional[Iterable[Tuple[
+                     paddle.Tensor, paddle.Tensor]]]=None):
         super().__init__()
         self.register_modules(vqvae=vqvae, unet=unet, scheduler=scheduler)
+        # paddle has no `inference_mode`, so at least make sure no layer runs in training mode
+        self.unet.eval()
+        self.vqvae.eval()
+        if trt_engine_path is not None:
+            sample_size = self.unet.config.sample_size
+            predictor = build_trt_engine(
+                self.unet,
+                (1, self.unet.config.in_channels, sample_size, sample_size),
+                trt_engine_path,
+                precision=trt_precision,
+                calibration_loader=trt_calibration_loader, )
+            bind_trt_engine(self.unet, predictor)
+        elif compile_model:
+            self.unet = self.compile_module(self.unet, compile_mode)
+            self.vqvae.decode = self.compile_module(self.vqvae.decode,
+                                                    compile_mode)
+
+    def enable_vqvae_decoder_trt(self,
+                                 save_directory: str,
+                                 batch_size: int=1,
+                                 precision: str="float16"):
+        r"""
+        Run `vqvae.decode` through a Paddle-TensorRT engine built for the static latent shape of `batch_size` images.
+
+        The engine is exported and cached in `save_directory` on the first call. Calls with another batch size keep
+        decoding eagerly.
+        """
+        sample_size = self.unet.config.sample_size
+        latent_shape = (batch_size, self.unet.config.out_channels, sample_size,
+                        sample_size)
+        predictor = build_vqvae_decoder_engine(
+            self.vqvae, latent_shape, save_directory, precision=precision)
+        bind_vqvae_decoder_engine(
+            self.vqvae, predictor, latent_shape=latent_shape)
+
+    def freeze_shapes(self, batch_size: int):
+        r"""
+        Specialize the unet on `batch_size` samples. The pipeline only accepts this batch size afterwards.
+        """
+        sample_size = self.unet.config.sample_size
+        self.freeze_unet_shape((batch_size, self.unet.config.in_channels,
+                                sample_size, sample_size))
 
     @paddle.no_grad()
     def __call__(self,
@@ -52,6 +114,7 @@ class LDMPipeline(DiffusionPipeline):
                  num_inference_steps: int=50,
                  output_type: Optional[str]="pil",
                  return_dict: bool=True,
+                 amp_dtype: Optional[str]=None,
                  **kwargs) -> Union[Tuple, ImagePipelineOutput]:
         """
         Args:
@@ -64,43 +127,59 @@ class LDMPipeline(DiffusionPipeline):
                 expense of slower inference.
             output_type (`str`, *optional*, defaults to `"pil"`):
                 The output format of the generate image. Choose between
-                [PIL](https://pillow.readthedocs.io/en/stable/): `PIL.Image.Image` or `np.array`.
+                [PIL](https://pillow.readthedocs.io/en/stable/): `PIL.Image.Image`, `np.array` or `"pd"`. `"pd"`
+                returns the same NHWC images as a `paddle.Tensor` that stays on the device, skipping the copy to host
+                memory when the images are consumed by another paddle model.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~pipelines.ImagePipelineOutput`] instead of a plain tuple.
+            amp_dtype (`str`, *optional*):
+                If set to `"float16"` or `"bfloat16"`, the denoising loop runs under `paddle.amp.auto_cast` with that
+                dtype. The latents and the final post-processing stay in the dtype of the model.
 
         Returns:
             [`~pipelines.ImagePipelineOutput`] or `tuple`: [`~pipelines.utils.ImagePipelineOutput`] if `return_dict` is
             True, otherwise a `tuple. When returning a tuple, the first element is a list with the generated images.
         """
-        latents = randn_tensor(
-            (
-                batch_size,
-                self.unet.config.in_channels,
-                self.unet.config.sample_size,
-                self.unet.config.sample_size, ),
-            generator=generator, )
-
-        # scale the initial noise by the standard deviation required by the scheduler
-        latents = latents * self.scheduler.init_noise_sigma
+        shape = (batch_size, self.unet.config.in_channels,
+                 self.unet.config.sample_size, self.unet.config.sample_size)
+        self.check_frozen_shape(shape)
+        latents = self.prepare_noise(
+            shape,
+            generator=generator,
+            # scale the initial noise by the standard deviation required by the scheduler while sampling it
+            std=self.scheduler.init_noise_sigma, )
 
         self.scheduler.set_timesteps(num_inference_steps)
 
         # prepare extra kwargs for the scheduler step, since not all schedulers have the same signature
-        accepts_eta = "eta" in set(
-            inspect.signature(self.scheduler.step).parameters.keys())
-        extra_kwargs = {}
-        if accepts_eta:
-            extra_kwargs["eta"] = eta
-        for t in self.progress_bar(self.scheduler.timesteps):
-            latent_model_input = self.scheduler.scale_model_input(latents, t)
-            # predict the noise residual
-            noise_prediction = self.unet(latent_model_input, t).sample
-            # compute the previous noisy sample x_t -> x_t-1
-            latents = self.scheduler.step(noise_prediction, t, latents,
-                                          **extra_kwargs).prev_sample
+        accepts_eta = "eta" in scheduler_step_parameters(self.scheduler)
+        extra_kwargs = {"eta": eta} if accepts_eta else {}
+        timesteps = self.scheduler.timesteps
+        # a single device-to-host copy: the scheduler then works on python scalars instead of syncing every step,
+        # while the unet keeps reading the timestep from the device
+        timesteps_host = timesteps.tolist()
+        with paddle.amp.auto_cast(
+                enable=amp_dtype is not None, dtype=amp_dtype or "float16"):
+            for i, t in enumerate(self.progress_bar(timesteps_host)):
+                latent_model_input = self.scheduler.scale_model_input(latents,
+                                                                      t)
+                # predict the noise residual
+                noise_prediction = self.unet(latent_model_input,
+                                             timesteps[i]).sample
+                if noise_prediction.dtype != latents.dtype:
+                    noise_prediction = noise_prediction.cast(latents.dtype)
+                # compute the previous noisy sample x_t -> x_t-1
+                latents = self.scheduler.step(noise_prediction, t, latents,
+                                              **extra_kwargs).prev_sample
         image = self.vqvae.decode(latents).sample
-        image = (image / 2 + 0.5).clip(min=0, max=1)
-        image = image.cpu().transpose(perm=[0, 2, 3, 1]).numpy()
+        # `scale` fuses `image / 2 + 0.5` into one kernel and the clip runs in place on its output, so the only other
+        # pass over the image is the NCHW -> NHWC transpose, done on device so `.numpy()` copies a contiguous buffer
+        image = paddle.scale(image, scale=0.5, bias=0.5).clip_(min=0, max=1)
+        image = image.transpose(perm=[0, 2, 3, 1])
+        if image.dtype != paddle.float32:
+            image = image.cast("float32")
+        if output_type != "pd":
+            image = image.numpy()
         if output_type == "pil":
             image = self.numpy_to_pil(image)
         if not return_dict:
@@ -0,0 +1,390 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from types import MethodType
+from typing import Callable, Iterable, List, Optional, Tuple
+
+import paddle
+import paddle.inference as paddle_infer
+import paddle.nn as nn
+
+from ..utils import FASTDEPLOY_MODEL_NAME, FASTDEPLOY_WEIGHTS_NAME, logging
+
+logger = logging.get_logger(__name__)
+
+# TensorRT kernels of the attention matmul/softmax lose too much accuracy in INT8,
+# so they are left to the native paddle kernels when building an INT8 engine.
+INT8_EXCLUDED_TRT_OPS = ["softmax", "matmul", "matmul_v2"]
+# paddle inference writes the INT8 calibration table of every engine as `trt_calib_<engine key>` in the optim cache dir
+TRT_CALIB_TABLE_PREFIX = "trt_calib_"
+
+
+def _check_precision(precision: str):
+    if precision not in ("int8", "float16", "float32"):
+        raise ValueError(
+            f"`precision` has to be one of ['int8', 'float16', 'float32'], but is {precision}."
+        )
+
+
+def _has_calibration_table(cache_dir):
+    return os.path.isdir(cache_dir) and any(
+        name.startswith(TRT_CALIB_TABLE_PREFIX)
+        for name in os.listdir(cache_dir))
+
+
+def _create_trt_predictor(model_file, params_file, cache_dir, precision,
+                          min_shapes, max_shapes, opt_shapes, max_batch_size,
+                          workspace_size):
+    precision_modes = {
+        "int8": paddle_infer.PrecisionType.Int8,
+        "float16": paddle_infer.PrecisionType.Half,
+        "float32": paddle_infer.PrecisionType.Float32,
+    }
+    config = paddle_infer.Config(model_file, params_file)
+    config.enable_use_gpu(256, paddle.distributed.ParallelEnv().dev_id)
+    config.enable_memory_optim()
+    config.set_optim_cache_dir(cache_dir)
+    config.enable_tensorrt_engine(
+        workspace_size=workspace_size,
+        max_batch_size=max_batch_size,
+        min_subgraph_size=3,
+        precision_mode=precision_modes[precision],
+        use_static=True,
+        use_calib_mode=precision == "int8", )
+    config.set_trt_dynamic_shape_info(min_shapes, max_shapes, opt_shapes)
+    if precision == "int8":
+        config.exp_disable_tensorrt_ops(INT8_EXCLUDED_TRT_OPS)
+    return paddle_infer.create_predictor(config)
+
+
+class UNetSampleWrapper(nn.Layer):
+    """
+    Wrap an unconditional `UNet2DModel` so that it takes `(sample, timestep)` and returns the predicted sample tensor,
+    which is the signature exported to paddle inference.
+    """
+
+    def __init__(self, unet):
+        super().__init__()
+        self.unet = unet
+
+    def forward(self, sample, timestep):
+        return self.unet(sample, timestep).sample
+
+
+def export_unet(unet, save_directory: str, sample_shape: Tuple[int]):
+    """
+    Save `unet` as a paddle inference model in `save_directory`. The batch dimension of `sample_shape` is exported as
+    dynamic.
+    """
+    model = paddle.jit.to_static(
+        UNetSampleWrapper(unet),
+        input_spec=[
+            paddle.static.InputSpec(
+                shape=[None, *sample_shape[1:]],
+                dtype="float32",
+                name="sample"),
+            paddle.static.InputSpec(
+                shape=[1], dtype="float32", name="timestep"),
+        ], )
+    save_path = os.path.join(save_directory,
+                             FASTDEPLOY_MODEL_NAME.rsplit(".", 1)[0])
+    paddle.jit.save(model, save_path)
+    logger.info(f"Save unet inference model in {save_path} successfully.")
+
+
+def build_trt_engine(
+        unet,
+        sample_shape: Tuple[int],
+        save_directory: str,
+        precision: str="float16",
+        calibration_loader: Optional[Iterable[Tuple["paddle.Tensor",
+                                                    "paddle.Tensor"]]]=None,
+        max_batch_size: int=8,
+        workspace_size: int=1 << 30,
+        static_shape: bool=False, ):
+    """
+    Build a Paddle-TensorRT predictor for an unconditional `UNet2DModel`.
+
+    The unet is exported to `save_directory` on the first call, and the serialized engine (and the INT8 calibration
+    table) is cached in `save_directory/_opt_cache`, so later calls only deserialize it.
+
+    Args:
+        unet (`UNet2DModel`):
+            The unet to accelerate.
+        sample_shape (`Tuple[int]`):
+            The optimal `(batch_size, in_channels, sample_size, sample_size)` shape the engine is tuned for.
+        save_directory (`str`):
+            Directory of the exported inference model and of the TensorRT cache.
+        precision (`str`, *optional*, defaults to `"float16"`):
+            One of `"int8"`, `"float16"` or `"float32"`. The attention matmul/softmax ops are kept out of INT8 engines.
+        calibration_loader (`Iterable[Tuple[paddle.Tensor, paddle.Tensor]]`, *optional*):
+            `(sample, timestep)` pairs used for the INT8 post-training calibration. Required for `"int8"` until the
+            calibration table has been written to the cache.
+        max_batch_size (`int`, *optional*, defaults to 8):
+            The largest batch size the engine accepts.
+        workspace_size (`int`, *optional*, defaults to `1 << 30`):
+            The TensorRT workspace size in bytes.
+        static_shape (`bool`, *optional*, defaults to `False`):
+            Whether to build the engine for exactly `sample_shape`, with equal min, optimal and max shapes. Static
+            engines are faster, but only accept `sample_shape`.
+
+    Returns:
+        `paddle.inference.Predictor`
+    """
+    _check_precision(precision)
+    model_file = os.path.join(save_directory, FASTDEPLOY_MODEL_NAME)
+    params_file = os.path.join(save_directory, FASTDEPLOY_WEIGHTS_NAME)
+    if not os.path.exists(model_file):
+        export_unet(unet, save_directory, sample_shape)
+    if static_shape:
+        max_batch_size = sample_shape[0]
+    min_batch_size = max_batch_size if static_shape else 1
+
+    cache_dir = os.path.join(save_directory, "_opt_cache")
+    use_calib_mode = precision == "int8"
+    need_calibration = use_calib_mode and not _has_calibration_table(cache_dir)
+
+    def create_predictor():
+        return _create_trt_predictor(
+            model_file,
+            params_file,
+            cache_dir,
+            precision,
+            min_shapes={"sample": [min_batch_size, *sample_shape[1:]],
+                        "timestep": [1]},
+            max_shapes={"sample": [max_batch_size, *sample_shape[1:]],
+                        "timestep": [1]},
+            opt_shapes={"sample": list(sample_shape),
+                        "timestep": [1]},
+            max_batch_size=max_batch_size,
+            workspace_size=workspace_size, )
+
+    if need_calibration:
+        if calibration_loader is None:
+            raise ValueError(
+                "`calibration_loader` is required to build an INT8 engine without an existing calibration table in"
+                f" {cache_dir}.")
+        # the calibration table is written when the calibrating predictor is released
+        calib_runner = PaddleInferenceRunner(create_predictor())
+        for sample, timestep in calibration_loader:
+            calib_runner(sample, timestep)
+        del calib_runner
+
+    return create_predictor()
+
+
+class PaddleInferenceRunner:
+    """
+    Run a `(sample, timestep) -> sample` or `sample -> sample` paddle inference predictor on paddle tensors.
+
+    On GPU the predictor handles share the memory of paddle tensors, so the denoising loop never round-trips through
+    host memory. The timestep handle is bound once to a persistent buffer that is only updated in place, and the
+    output shape is only recomputed when the input shape changes.
+    """
+
+    def __init__(self,
+                 predictor,
+                 out_channels: Optional[int]=None,
+                 output_shape_fn: Optional[Callable[[List[int]], List[
+                     int]]]=None):
+        self.predictor = predictor
+        input_names = predictor.get_input_names()
+        self.sample_handle = predictor.get_input_handle(input_names[0])
+        self.timestep_handle = (predictor.get_input_handle(input_names[1])
+                                if len(input_names) > 1 else None)
+        self.output_handle = predictor.get_output_handle(
+            predictor.get_output_names()[0])
+        self.out_channels = out_channels
+        self.output_shape_fn = output_shape_fn
+        self.zero_copy = "gpu" in paddle.get_device()
+        self._timestep = None
+        self._input_shape = None
+        self._output_shape = None
+
+    def _get_output_shape(self, input_shape):
+        if self.output_shape_fn is not None:
+            return list(self.output_shape_fn(input_shape))
+        return [
+            input_shape[0], self.out_channels or input_shape[1],
+            *input_shape[2:]
+        ]
+
+    def __call__(self, sample, timestep=None):
+        if self.timestep_handle is not None:
+            if not paddle.is_tensor(timestep):
+                timestep = paddle.to_tensor([timestep])
+            timestep = timestep.reshape([1]).cast("float32")
+        dtype = sample.dtype
+        if dtype != paddle.float32:
+            sample = sample.cast("float32")
+
+        if not self.zero_copy:
+            self.sample_handle.copy_from_cpu(sample.numpy())
+            if self.timestep_handle is not None:
+                self.timestep_handle.copy_from_cpu(timestep.numpy())
+            self.predictor.run()
+            return paddle.to_tensor(self.output_handle.copy_to_cpu()).cast(
+                dtype)
+
+        if self.timestep_handle is not None:
+            if self._timestep is None:
+                self._timestep = paddle.zeros([1], dtype="float32")
+                self.timestep_handle.share_external_data(self._timestep)
+            paddle.assign(timestep, output=self._timestep)
+
+        if sample.shape != self._input_shape:
+            self._input_shape = sample.shape
+            self._output_shape = self._get_output_shape(sample.shape)
+        self.sample_handle.share_external_data(sample)
+        # allocate a fresh output every step, schedulers such as PNDM keep references to previous model outputs
+        output = paddle.empty(self._output_shape, dtype="float32")
+        self.output_handle.share_external_data(output)
+        self.predictor.run()
+        if dtype != paddle.float32:
+            output = output.cast(dtype)
+        return output
+
+
+def bind_trt_engine(unet, predictor):
+    """
+    Replace `unet.forward` with a call into `predictor`, so pipelines keep calling `self.unet(sample, t).sample`.
+    """
+    from ..models.unet_2d import UNet2DOutput
+
+    runner = PaddleInferenceRunner(
+        predictor, out_channels=unet.config.out_channels)
+
+    def forward(self, sample, timestep, class_labels=None, return_dict=True):
+        if class_labels is not None:
+            # the engine is exported with `sample` and `timestep` as its only inputs
+            raise ValueError(
+                "`class_labels` are not supported by a unet bound to a TensorRT engine."
+            )
+        output = runner(sample, timestep)
+        if not return_dict:
+            return (output, )
+        return UNet2DOutput(sample=output)
+
+    unet.forward = MethodType(forward, unet)
+    unet.trt_runner = runner
+    return unet
+
+
+class VQDecoderWrapper(nn.Layer):
+    """
+    Wrap `VQModel.decode` so that it takes the latents and returns the decoded image tensor, which is the signature
+    exported to paddle inference.
+    """
+
+    def __init__(self, vqvae):
+        super().__init__()
+        self.vqvae = vqvae
+
+    def forward(self, latents):
+        return self.vqvae.decode(latents).sample
+
+
+def build_vqvae_decoder_engine(
+        vqvae,
+        latent_shape: Tuple[int],
+        save_directory: str,
+        precision: str="float16",
+        workspace_size: int=1 << 30, ):
+    """
+    Build a Paddle-TensorRT predictor for `VQModel.decode` with a fully static input shape.
+
+    The decoder runs once per pipeline call on latents of a fixed shape, so the engine is built for exactly
+    `latent_shape`, which lets TensorRT specialize every kernel. The exported model and the serialized engine are
+    cached in `save_directory`.
+
+    Args:
+        vqvae (`VQModel`):
+            The autoencoder whose decoder is accelerated.
+        latent_shape (`Tuple[int]`):
+            The `(batch_size, latent_channels, sample_size, sample_size)` shape of the latents to decode.
+        save_directory (`str`):
+            Directory of the exported inference model and of the TensorRT cache.
+        precision (`str`, *optional*, defaults to `"float16"`):
+            One of `"int8"`, `"float16"` or `"float32"`. INT8 requires an existing calibration table.
+        workspace_size (`int`, *optional*, defaults to `1 << 30`):
+            The TensorRT workspace size in bytes.
+
+    Returns:
+        `paddle.inference.Predictor`
+    """
+    _check_precision(precision)
+    model_file = os.path.join(save_directory, FASTDEPLOY_MODEL_NAME)
+    params_file = os.path.join(save_directory, FASTDEPLOY_WEIGHTS_NAME)
+    if not os.path.exists(model_file):
+        model = paddle.jit.to_static(
+            VQDecoderWrapper(vqvae),
+            input_spec=[
+                paddle.static.InputSpec(
+                    shape=list(latent_shape), dtype="float32", name="latents")
+            ], )
+        paddle.jit.save(model, model_file.rsplit(".", 1)[0])
+        logger.info(
+            f"Save vqvae decoder inference model in {save_directory} successfully."
+        )
+
+    shapes = {"latents": list(latent_shape)}
+    return _create_trt_predictor(
+        model_file,
+        params_file,
+        os.path.join(save_directory, "_opt_cache"),
+        precision,
+        min_shapes=shapes,
+        max_shapes=shapes,
+        opt_shapes=shapes,
+        max_batch_size=latent_shape[0],
+        workspace_size=workspace_size, )
+
+
+def bind_vqvae_decoder_engine(vqvae,
+                              predictor,
+                              latent_shape: Optional[Tuple[int]]=None):
+    """
+    Replace `vqvae.decode` with a call into `predictor`, so pipelines keep calling `self.vqvae.decode(latents).sample`.
+    Latents of another shape than the static `latent_shape` of the engine are decoded eagerly.
+    """
+    from ..models.vae import DecoderOutput
+
+    upscale_factor = 2**(len(vqvae.config.block_out_channels) - 1)
+    runner = PaddleInferenceRunner(
+        predictor,
+        output_shape_fn=lambda shape: [
+            shape[0],
+            vqvae.config.out_channels,
+            shape[2] * upscale_factor,
+            shape[3] * upscale_factor,
+        ], )
+
+    eager_decode = vqvae.decode
+
+    def decode(self, h, force_not_quantize=False, return_dict=True):
+        if force_not_quantize or (latent_shape is not None and
+                                  h.shape != list(latent_shape)):
+            return eager_decode(
+                h,
+                force_not_quantize=force_not_quantize,
+                return_dict=return_dict)
+        output = runner(h)
+        if not return_dict:
+            return (output, )
+        return DecoderOutput(sample=output)
+
+    vqvae.decode = MethodType(decode, vqvae)
+    vqvae.trt_decoder_runner = runner
+    return vqvae
@@ -24,6 +24,7 @@ import sys
 import tempfile
 import warnings
 from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
 
@@ -53,6 +54,8 @@ if is_paddle_available():
     import paddle
     import paddle.nn as nn
 
+    from ..utils.paddle_utils import randn_tensor
+
 if is_paddlenlp_available():
     from paddlenlp.transformers import PretrainedModel
 
@@ -133,6 +136,124 @@ class AudioPipelineOutput(BaseOutput):
     audios: np.ndarray
 
 
+@lru_cache(maxsize=None)
+def _get_step_parameters(scheduler_cls) -> frozenset:
+    return frozenset(inspect.signature(scheduler_cls.step).parameters.keys())
+
+
+def scheduler_step_parameters(scheduler) -> frozenset:
+    """
+    Return the names of the arguments accepted by `scheduler.step`. The lookup is cached per scheduler class, so
+    pipelines can call it on every `__call__` without paying for `inspect.signature` each time.
+    """
+    return _get_step_parameters(type(scheduler))
+
+
+class CUDAGraphRunner:
+    """
+    Replace the forward of a layer with a CUDA graph replay, so that a denoising step costs a single launch instead of
+    one launch per kernel. A graph is captured per input signature (tensor shapes/dtypes and non-tensor arguments,
+    python numbers are passed as tensors). Calls with unhashable arguments run eagerly.
+    Since a graph always reads from the addresses it was captured with, the inputs are copied into static buffers
+    before each replay, and the outputs are cloned because schedulers may keep references to previous outputs. If the
+    capture fails, the runner falls back to the eager forward.
+    """
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.eager_forward = layer.forward
+        self.graphs = {}
+        self.failed = False
+
+    @staticmethod
+    def _scalars_to_tensors(args, kwargs):
+        # a python int/float (e.g. the timestep of the host timestep loops) would be baked into the graph and give a
+        # new signature every step, as a tensor it is copied into the static buffer of the graph like the other inputs
+        def convert(value):
+            if isinstance(value, (int, float)) and not isinstance(value,
+                                                                  bool):
+                return paddle.to_tensor(value)
+            return value
+
+        return ([convert(v) for v in args],
+                {k: convert(v)
+                 for k, v in kwargs.items()})
+
+    @staticmethod
+    def _signature(args, kwargs):
+        def key(value):
+            if paddle.is_tensor(value):
+                return (tuple(value.shape), str(value.dtype))
+            return value
+
+        return (tuple(key(v) for v in args),
+                tuple((k, key(v)) for k, v in sorted(kwargs.items())))
+
+    @staticmethod
+    def _clone_output(output):
+        if paddle.is_tensor(output):
+            return output.clone()
+        if isinstance(output, tuple):
+            return tuple(o.clone() if paddle.is_tensor(o) else o
+                         for o in output)
+        return output.__class__(**{
+            k: v.clone() if paddle.is_tensor(v) else v
+            for k, v in output.items()
+        })
+
+    def _capture(self, args, kwargs):
+        from paddle.device.cuda.graphs import CUDAGraph
+
+        static_args = [v.clone() if paddle.is_tensor(v) else v for v in args]
+        static_kwargs = {
+            k: v.clone() if paddle.is_tensor(v) else v
+            for k, v in kwargs.items()
+        }
+        # run once outside of the capture so that lazy initializations are not recorded
+        self.eager_forward(*static_args, **static_kwargs)
+        graph = CUDAGraph()
+        graph.capture_begin()
+        static_output = self.eager_forward(*static_args, **static_kwargs)
+        graph.capture_end()
+        return graph, static_args, static_kwargs, static_output
+
+    def __call__(self, *args, **kwargs):
+        if self.failed:
+            return self.eager_forward(*args, **kwargs)
+        graph_args, graph_kwargs = self._scalars_to_tensors(args, kwargs)
+        signature = self._signature(graph_args, graph_kwargs)
+        try:
+            hash(signature)
+        except TypeError:
+            # arguments like lists or dicts cannot key a graph, these calls run eagerly
+            return self.eager_forward(*args, **kwargs)
+        args, kwargs = graph_args, graph_kwargs
+        if signature not in self.graphs:
+            try:
+                self.graphs[signature] = self._capture(args, kwargs)
+            except Exception as e:
+                logger.warning(
+                    f"CUDA graph capture of {self.layer.__class__.__name__} failed, falling back to eager mode: {e}"
+                )
+                self.failed = True
+                return self.eager_forward(*args, **kwargs)
+        graph, static_args, static_kwargs, static_output = self.graphs[
+            signature]
+        for static, value in zip(static_args, args):
+            if paddle.is_tensor(value):
+                paddle.assign(value, output=static)
+        for k, value in kwargs.items():
+            if paddle.is_tensor(value):
+                paddle.assign(value, output=static_kwargs[k])
+        graph.replay()
+        return self._clone_output(static_output)
+
+    def reset(self):
+        for graph, *_ in self.graphs.values():
+            graph.reset()
+        self.graphs = {}
+
+
 def is_safetensors_compatible(filenames, variant=None,
                               passed_components=None) -> bool:
     """
@@ -503,9 +624,12 @@ class DiffusionPipeline(ConfigMixin):
           components of the diffusion pipeline.
         - **_optional_components** (List[`str`]) -- list of all components that are optional so they don't have to be
           passed for the pipeline to function (should be overridden by subclasses).
+        - **cuda_graph_modules** (List[`str`]) -- names of the denoising networks captured by
+          [`~DiffusionPipeline.enable_cuda_graph`].
     """
     config_name = "model_index.json"
     _optional_components = []
+    cuda_graph_modules = ["unet"]
 
     def register_modules(self, **kwargs):
         # import it here to avoid circular import
@@ -1648,6 +1772,67 @@ class DiffusionPipeline(ConfigMixin):
         """
         return numpy_to_pil(images)
 
+    @staticmethod
+    def compile_module(module, compile_mode: Optional[str]=None,
+                       input_spec=None):
+        """
+        Convert a `nn.Layer` (or one of its bound methods, e.g. `vqvae.decode`) to a static graph with
+        `paddle.jit.to_static`, so that the repeated calls inside the denoising loop skip the per-op python dispatch.
+        The graph is built on the first call.
+
+        Args:
+            module (`nn.Layer` or `Callable`):
+                The layer or bound method to compile.
+            compile_mode (`str`, *optional*):
+                Forwarded as `backend` to `paddle.jit.to_static`, e.g. `"CINN"`. Defaults to paddle's own backend.
+            input_spec (`List[paddle.static.InputSpec]`, *optional*):
+                Input specification of the compiled callable. Inferred from the first call if not provided.
+        """
+        kwargs = {}
+        if compile_mode is not None:
+            kwargs["backend"] = compile_mode
+        return paddle.jit.to_static(module, input_spec=input_spec, **kwargs)
+
+    def freeze_unet_shape(self, sample_shape):
+        r"""
+        Specialize the unet on a fixed `sample_shape`.
+
+        The unet is converted with `paddle.jit.to_static` with a fully static input shape, which lets paddle select and
+        fuse kernels that dynamic shapes rule out. Unets that already run through a TensorRT engine or that were
+        already converted, e.g. with `compile_model=True`, are left as is. Calling the unet with another shape
+        afterwards raises an error.
+        """
+        sample_shape = list(sample_shape)
+        # `to_static` replaces `forward` with a static function that exposes its `concrete_program`
+        is_static = hasattr(self.unet.forward, "concrete_program")
+        if not hasattr(self.unet, "trt_runner") and not is_static:
+            # the denoising loops call `self.unet(sample, timesteps[i])`, the timestep spec takes the dtype of the
+            # scheduler timesteps without touching the schedule of the scheduler
+            timesteps = getattr(self.scheduler, "timesteps", None)
+            timestep_dtype = timesteps.dtype if paddle.is_tensor(
+                timesteps) else "int64"
+            self.unet = self.compile_module(
+                self.unet,
+                input_spec=[
+                    paddle.static.InputSpec(
+                        shape=sample_shape, dtype=self.unet.dtype,
+                        name="sample"),
+                    paddle.static.InputSpec(
+                        shape=[1], dtype=timestep_dtype, name="timestep"),
+                ], )
+        self._frozen_sample_shape = sample_shape
+
+    def check_frozen_shape(self, sample_shape):
+        r"""
+        Raise an error if the unet is frozen with [`~DiffusionPipeline.freeze_unet_shape`] and `sample_shape`, the shape
+        of a sample fed to the unet, differs from the frozen one.
+        """
+        frozen_shape = getattr(self, "_frozen_sample_shape", None)
+        if frozen_shape is not None and list(sample_shape) != frozen_shape:
+            raise ValueError(
+                f"The unet of {self.__class__.__name__} is frozen to the sample shape {frozen_shape}, but the pipeline"
+                f" was called with {list(sample_shape)}.")
+
     def progress_bar(self, iterable=None, total=None):
         if not hasattr(self, "_progress_bar_config"):
             self._progress_bar_config = {}
@@ -1657,6 +1842,9 @@ class DiffusionPipeline(ConfigMixin):
             )
 
         if iterable is not None:
+            # a disabled bar would still wrap every step of the loop, so hand back the plain iterable instead
+            if self._progress_bar_config.get("disable") is True:
+                return iterable
             return tqdm(iterable, **self._progress_bar_config)
         elif total is not None:
             return tqdm(total=total, **self._progress_bar_config)
@@ -1666,6 +1854,24 @@ class DiffusionPipeline(ConfigMixin):
     def set_progress_bar_config(self, **kwargs):
         self._progress_bar_config = kwargs
 
+    def prepare_noise(self, shape, generator=None, dtype=None, std=1.0):
+        r"""
+        Sample the initial gaussian noise of a pipeline call with [`~utils.randn_tensor`].
+
+        Every call returns a new tensor, so the noise (and the latents denoised in place from it) never aliases the
+        noise of an earlier call. `std` scales the noise, e.g. by the `init_noise_sigma` of the scheduler; the scaling
+        is skipped when it is 1.
+        """
+        noise = randn_tensor(shape, generator=generator, dtype=dtype)
+        std = float(std)
+        return noise if std == 1.0 else noise * std
+
+    def clear_cache(self):
+        r"""
+        Release the caches a pipeline keeps between calls. The base pipeline keeps none, pipelines with caches extend
+        this method.
+        """
+
     def enable_xformers_memory_efficient_attention(
             self, attention_op: Optional[str]=None):
         r"""
@@ -1779,6 +1985,77 @@ class DiffusionPipeline(ConfigMixin):
         if hasattr(self, "vqvae"):
             self.vqvae.disable_slicing()
 
+    def enable_cuda_graph(self):
+        r"""
+        Enable CUDA graph capture of the denoising network forward.
+
+        When this option is enabled, the forward of every layer named in `cuda_graph_modules` (the unet by default) is
+        replayed from a CUDA graph captured on its first call with a given input shape, which removes the per-kernel
+        launch overhead. This mostly helps small batch sizes and sample sizes, where the launch overhead is significant.
+        """
+        layers = [
+            getattr(self, name, None) for name in self.cuda_graph_modules
+        ]
+        layers = [layer for layer in layers if isinstance(layer, nn.Layer)]
+        if not layers:
+            raise ValueError(
+                f"{self.__class__.__name__} has no {self.cuda_graph_modules} layer to capture."
+            )
+        from paddle.device.cuda.graphs import is_cuda_graph_supported
+
+        if not is_cuda_graph_supported():
+            logger.warning(
+                "CUDA graphs are not supported by this paddle build, `enable_cuda_graph` is ignored."
+            )
+            return
+        for layer in layers:
+            if not isinstance(getattr(layer, "forward", None), CUDAGraphRunner):
+                layer.forward = CUDAGraphRunner(layer)
+
+    def disable_cuda_graph(self):
+        r"""
+        Disable CUDA graph capture of the denoising network forward. If `enable_cuda_graph` was previously invoked, this
+        method will go back to running the layers eagerly.
+        """
+        for name in self.cuda_graph_modules:
+            layer = getattr(self, name, None)
+            runner = getattr(layer, "forward", None)
+            if isinstance(runner, CUDAGraphRunner):
+                runner.reset()
+                layer.forward = runner.eager_forward
+
+    def enable_channels_last(self):
+        r"""
+        Enable the channels last (NHWC) layout for the convolutions of the pipeline.
+
+        Paddle layers have no `memory_format`, so this enables paddle's layout autotuning, which runs the convolutions
+        of models executed under `paddle.amp.auto_cast` with float16 in NHWC, and the kernel autotuning, which picks the
+        fastest cuDNN algorithm per input shape. Use it together with `amp_dtype="float16"` on tensor core GPUs. The
+        inputs and outputs of the pipeline keep their usual layout. Note that the autotune config is process wide.
+        """
+        paddle.incubate.autotune.set_config({
+            "kernel": {
+                "enable": True
+            },
+            "layout": {
+                "enable": True
+            },
+        })
+
+    def disable_channels_last(self):
+        r"""
+        Disable the channels last layout. If `enable_channels_last` was previously invoked, the convolutions go back
+        to running in NCHW.
+        """
+        paddle.incubate.autotune.set_config({
+            "kernel": {
+                "enable": False
+            },
+            "layout": {
+                "enable": False
+            },
+        })
+
     def enable_vae_tiling(self):
         r"""
         Enable tiled VAE decoding.
@@ -13,13 +13,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import List, Optional, Tuple, Union
+from typing import Iterable, List, Optional, Tuple, Union
 
 import paddle
 
 from ...models import UNet2DModel
 from ...schedulers import PNDMScheduler
-from ...utils import randn_tensor
+from ..paddle_infer_utils import bind_trt_engine, build_trt_engine
 from ..pipeline_utils import DiffusionPipeline, ImagePipelineOutput
 
 
@@ -32,17 +32,60 @@ class PNDMPipeline(DiffusionPipeline):
         unet (`UNet2DModel`): U-Net architecture to denoise the encoded image latents.
         scheduler ([`SchedulerMixin`]):
             The `PNDMScheduler` to be used in combination with `unet` to denoise the encoded image.
+        compile_model (`bool`, *optional*, defaults to `False`):
+            Whether to convert `unet` to a static graph with `paddle.jit.to_static` to speed up the denoising loop.
+        compile_mode (`str`, *optional*):
+            The `paddle.jit.to_static` backend used when `compile_model` is enabled, e.g. `"CINN"`.
+        trt_engine_path (`str`, *optional*):
+            Directory of a Paddle-TensorRT unet engine prepared with
+            [`~pipelines.paddle_infer_utils.build_trt_engine`]. If set, the unet forward runs through the engine.
+        trt_precision (`str`, *optional*, defaults to `"float16"`):
+            The precision of the TensorRT engine, one of `"int8"`, `"float16"` or `"float32"`.
+        trt_calibration_loader (`Iterable[Tuple[paddle.Tensor, paddle.Tensor]]`, *optional*):
+            `(sample, timestep)` pairs to calibrate an `"int8"` engine with. Only needed until the calibration table
+            is cached in `trt_engine_path`.
     """
 
     unet: UNet2DModel
     scheduler: PNDMScheduler
 
-    def __init__(self, unet: UNet2DModel, scheduler: PNDMScheduler):
+    def __init__(self,
+                 unet: UNet2DModel,
+                 scheduler: PNDMScheduler,
+                 compile_model: bool=False,
+                 compile_mode: Optional[str]=None,
+                 trt_engine_path: Optional[str]=None,
+                 trt_precision: str="float16",
+                 trt_calibration_loader: Optional[Iterable[Tuple[
+                     paddle.Tensor, paddle.Tensor]]]=None):
         super().__init__()
 
-        scheduler = PNDMScheduler.from_config(scheduler.config)
+        # only convert schedulers of another type, a `PNDMScheduler` is used as is
+        if not isinstance(scheduler, PNDMScheduler):
+            scheduler = PNDMScheduler.from_config(scheduler.config)
 
         self.register_modules(unet=unet, scheduler=scheduler)
+        # paddle has no `inference_mode`, so at least make sure no layer runs in training mode
+        self.unet.eval()
+        if trt_engine_path is not None:
+            sample_size = self.unet.config.sample_size
+            predictor = build_trt_engine(
+                self.unet,
+                (1, self.unet.config.in_channels, sample_size, sample_size),
+                trt_engine_path,
+                precision=trt_precision,
+                calibration_loader=trt_calibration_loader, )
+            bind_trt_engine(self.unet, predictor)
+        elif compile_model:
+            self.unet = self.compile_module(self.unet, compile_mode)
+
+    def freeze_shapes(self, batch_size: int):
+        r"""
+        Specialize the unet on `batch_size` samples. The pipeline only accepts this batch size afterwards.
+        """
+        sample_size = self.unet.config.sample_size
+        self.freeze_unet_shape((batch_size, self.unet.config.in_channels,
+                                sample_size, sample_size))
 
     @paddle.no_grad()
     def __call__(
@@ -53,6 +96,7 @@ class PNDMPipeline(DiffusionPipeline):
                 paddle.Generator]]]=None,
             output_type: Optional[str]="pil",
             return_dict: bool=True,
+            amp_dtype: Optional[str]=None,
             **kwargs, ) -> Union[ImagePipelineOutput, Tuple]:
         r"""
         Args:
@@ -66,6 +110,9 @@ class PNDMPipeline(DiffusionPipeline):
                 between [PIL](https://pillow.readthedocs.io/en/stable/): `PIL.Image.Image` or `np.array`.
             return_dict (`bool`, `optional`, defaults to `True`): Whether or not to return a
                 [`~pipelines.ImagePipelineOutput`] instead of a plain tuple.
+            amp_dtype (`str`, `optional`): If set to `"float16"` or `"bfloat16"`, the denoising loop runs under
+                `paddle.amp.auto_cast` with that dtype. The latents and the final post-processing stay in the dtype of
+                the model.
 
         Returns:
             [`~pipelines.ImagePipelineOutput`] or `tuple`: [`~pipelines.utils.ImagePipelineOutput`] if `return_dict` is
@@ -75,22 +122,34 @@ class PNDMPipeline(DiffusionPipeline):
         # the official paper: https://arxiv.org/pdf/2202.09778.pdf
 
         # Sample gaussian noise to begin loop
-        image = randn_tensor(
-            (
-                batch_size,
-                self.unet.config.in_channels,
-                self.unet.config.sample_size,
-                self.unet.config.sample_size, ),
+        shape = (batch_size, self.unet.config.in_channels,
+                 self.unet.config.sample_size, self.unet.config.sample_size)
+        self.check_frozen_shape(shape)
+        image = self.prepare_noise(
+            shape,
             generator=generator, )
 
         self.scheduler.set_timesteps(num_inference_steps)
-        for t in self.progress_bar(self.scheduler.timesteps):
-            model_output = self.unet(image, t).sample
-
-            image = self.scheduler.step(model_output, t, image).prev_sample
-
-        image = (image / 2 + 0.5).clip(0, 1)
-        image = image.transpose([0, 2, 3, 1]).cast("float32").numpy()
+        timesteps = self.scheduler.timesteps
+        # a single device-to-host copy: the scheduler then works on python scalars instead of syncing every step,
+        # while the unet keeps reading the timestep from the device
+        timesteps_host = timesteps.tolist()
+        with paddle.amp.auto_cast(
+                enable=amp_dtype is not None, dtype=amp_dtype or "float16"):
+            for i, t in enumerate(self.progress_bar(timesteps_host)):
+                model_output = self.unet(image, timesteps[i]).sample
+                if model_output.dtype != image.dtype:
+                    model_output = model_output.cast(image.dtype)
+
+                image = self.scheduler.step(model_output, t, image).prev_sample
+
+        # `scale` fuses `image / 2 + 0.5` into one kernel and the clip runs in place on its output
+        image = paddle.scale(image, scale=0.5, bias=0.5).clip_(0, 1)
+        image = image.transpose([0, 2, 3, 1])
+        # the noise is sampled in float32, so only cast when amp or a half precision unet changed the dtype
+        if image.dtype != paddle.float32:
+            image = image.cast("float32")
+        image = image.numpy()
         if output_type == "pil":
             image = self.numpy_to_pil(image)
 
@@ -23,6 +23,7 @@ from paddlenlp.transformers import (CLIPImageProcessor,
                                     CLIPVisionModelWithProjection)
 
 from ...models import UNet2DConditionModel, UNet2DModel
+from ...models.attention_processor import Attention
 from ...pipelines import DiffusionPipeline, ImagePipelineOutput
 from ...schedulers import UnCLIPScheduler
 from ...utils import logging, randn_tensor
@@ -30,6 +31,13 @@ from .text_proj import UnCLIPTextProjModel
 
 logger = logging.get_logger(__name__)  # pylint: disable=invalid-name
 
+# `inspect.signature` is slow, so whether `F.interpolate` supports antialiasing is only checked once
+_INTERPOLATE_SUPPORTS_ANTIALIAS = "antialias" in inspect.signature(
+    F.interpolate).parameters
+_INTERPOLATE_ANTIALIAS_KWARGS = ({
+    "antialias": True
+} if _INTERPOLATE_SUPPORTS_ANTIALIAS else {})
+
 
 class UnCLIPImageVariationPipeline(DiffusionPipeline):
     """
@@ -62,6 +70,11 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             Scheduler used in the decoder denoising process. Just a modified DDPMScheduler.
         super_res_scheduler ([`UnCLIPScheduler`]):
             Scheduler used in the super resolution denoising process. Just a modified DDPMScheduler.
+        compile_model (`bool`, *optional*, defaults to `False`):
+            Whether to convert `decoder`, `super_res_first` and `super_res_last` to static graphs with
+            `paddle.jit.to_static` to speed up the denoising loops.
+        compile_mode (`str`, *optional*):
+            The `paddle.jit.to_static` backend used when `compile_model` is enabled, e.g. `"CINN"`.
 
     """
 
@@ -77,6 +90,14 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
     decoder_scheduler: UnCLIPScheduler
     super_res_scheduler: UnCLIPScheduler
 
+    # the number of `(decoder_num_inference_steps, super_res_num_inference_steps)` combinations whose timesteps are kept
+    _max_sched_cache_size = 8
+
+    # the decoder and both super resolution unets run with static shapes in every step, each of them captures its own
+    # graph so the last super resolution step replays `super_res_last`. Only layers are captured, the scheduler steps
+    # run eagerly between the replays with `step_tensor` on the noise pre-sampled by `_prepare_step_noise`
+    cuda_graph_modules = ["decoder", "super_res_first", "super_res_last"]
+
     def __init__(
             self,
             decoder: UNet2DConditionModel,
@@ -88,7 +109,9 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             super_res_first: UNet2DModel,
             super_res_last: UNet2DModel,
             decoder_scheduler: UnCLIPScheduler,
-            super_res_scheduler: UnCLIPScheduler, ):
+            super_res_scheduler: UnCLIPScheduler,
+            compile_model: bool=False,
+            compile_mode: Optional[str]=None, ):
         super().__init__()
 
         self.register_modules(
@@ -102,6 +125,109 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             super_res_last=super_res_last,
             decoder_scheduler=decoder_scheduler,
             super_res_scheduler=super_res_scheduler, )
+        self._uncond_cache = {}
+        self._sched_cache = {}
+        self._ones_prefix = None
+        if compile_model:
+            # the denoising unets run with the same shapes in every step, to_static builds one program per shape
+            self.decoder = self.compile_module(self.decoder, compile_mode)
+            self.super_res_first = self.compile_module(self.super_res_first,
+                                                       compile_mode)
+            self.super_res_last = self.compile_module(self.super_res_last,
+                                                      compile_mode)
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.enable_half_precision
+    def enable_half_precision(self, dtype: paddle.dtype=paddle.float16):
+        r"""
+        Cast the weights of all the models of the pipeline to `dtype`, `paddle.float16` or `paddle.bfloat16`, which
+        halves the memory traffic of every matmul and convolution of the denoising loops. The latents of each stage
+        follow the dtype of the model that consumes them.
+        """
+        self.to(paddle_dtype=dtype)
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.fuse_qkv_projections
+    def fuse_qkv_projections(self):
+        r"""
+        Merge the query, key and value projections of every attention layer of `decoder`, `super_res_first` and
+        `super_res_last` into one matmul, see [`~models.attention_processor.Attention.fuse_projections`]. The
+        self attention of each block then runs one large matmul instead of three. Call it after loading the weights
+        and before [`~DiffusionPipeline.enable_cuda_graph`], the graphs captured earlier still replay the separate
+        projections.
+        """
+        for name in ["decoder", "super_res_first", "super_res_last"]:
+            for layer in getattr(self, name).sublayers(include_self=True):
+                if isinstance(layer, Attention):
+                    layer.fuse_projections()
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.unfuse_qkv_projections
+    def unfuse_qkv_projections(self):
+        r"""
+        Disable the fused projections enabled by [`~UnCLIPPipeline.fuse_qkv_projections`].
+        """
+        for name in ["decoder", "super_res_first", "super_res_last"]:
+            for layer in getattr(self, name).sublayers(include_self=True):
+                if isinstance(layer, Attention):
+                    layer.unfuse_projections()
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.quantize
+    def quantize(self, calibration_inputs, quant_bits: int=8, **kwargs):
+        r"""
+        Post-training quantization of the decoder and of the super resolution unets.
+
+        Observers are inserted into the `Linear` and `Conv2D` layers of `decoder`, `super_res_first` and
+        `super_res_last`, the pipeline is run once per item of `calibration_inputs` to collect the absmax ranges of
+        every denoising step, and the layers are then converted to quantized ones. The converted unets simulate the
+        quantization with quantize/dequantize ops, export them with `paddle.jit.save` and run them with Paddle
+        Inference (e.g. its TensorRT INT8 backend) to get the speed up.
+
+        Args:
+            calibration_inputs (`Iterable`):
+                The first argument of each calibration call of the pipeline, e.g. a list of prompts or images.
+            quant_bits (`int`, *optional*, defaults to 8):
+                The number of bits of the quantized weights and activations.
+            kwargs:
+                Forwarded to every calibration call of the pipeline, e.g. `decoder_num_inference_steps`.
+        """
+        from paddle.quantization import PTQ, QuantConfig
+        from paddle.quantization.observers import AbsmaxObserver
+
+        ptqs = {}
+        for name in ["decoder", "super_res_first", "super_res_last"]:
+            q_config = QuantConfig(
+                activation=AbsmaxObserver(quant_bits=quant_bits),
+                weight=AbsmaxObserver(quant_bits=quant_bits), )
+            ptqs[name] = PTQ(q_config)
+            ptqs[name].quantize(getattr(self, name), inplace=True)
+
+        kwargs.setdefault("output_type", "np")
+        for inputs in calibration_inputs:
+            self(inputs, **kwargs)
+
+        for name, ptq in ptqs.items():
+            ptq.convert(getattr(self, name), inplace=True)
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.__setattr__
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        # the cached unconditional embeddings were computed with the previous tokenizer or text encoder
+        if name in ("tokenizer", "text_encoder") and "_uncond_cache" in self.__dict__:
+            self._uncond_cache.clear()
+        # the cached timesteps were created by the previous schedulers
+        if name in ("decoder_scheduler", "super_res_scheduler"
+                    ) and "_sched_cache" in self.__dict__:
+            self._sched_cache.clear()
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.clear_cache
+    def clear_cache(self):
+        r"""
+        Release the cached unconditional text embeddings and timesteps along with the caches released by
+        [`~DiffusionPipeline.clear_cache`]. Replacing `tokenizer`, `text_encoder` or one of the schedulers clears the
+        matching cache automatically, call this after changing the weights of `text_encoder` in place, e.g. with
+        `set_state_dict` or LoRA weights.
+        """
+        super().clear_cache()
+        self._uncond_cache.clear()
+        self._sched_cache.clear()
 
     # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline.prepare_latents
     def prepare_latents(self, shape, dtype, generator, latents, scheduler):
@@ -116,6 +242,99 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
         latents = latents * scheduler.init_noise_sigma
         return latents
 
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline._prepare_step_noise
+    def _prepare_step_noise(self, num_steps, latents, generator):
+        # every step but the last one adds noise, it is drawn for all of them with a single random kernel before the
+        # loop instead of once per step, so the loop itself holds no random state
+        if num_steps < 2:
+            return None
+        if not isinstance(generator, list):
+            # step-major, a single generator yields the same sequence as the per-step sampling did
+            return randn_tensor(
+                [num_steps - 1, *latents.shape],
+                generator=generator,
+                dtype=latents.dtype, )
+        # a list of generators seeds one sample each, so the steps are sampled along the second axis
+        noise = randn_tensor(
+            [latents.shape[0], num_steps - 1, *latents.shape[1:]],
+            generator=generator,
+            dtype=latents.dtype, )
+        return noise.transpose([1, 0, *range(2, noise.ndim)])
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline._get_uncond_cache_key
+    def _get_uncond_cache_key(self, max_length):
+        # the cache is cleared whenever the tokenizer or the text encoder is replaced, see `__setattr__`
+        return (max_length, self.text_encoder.dtype)
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline._encode_uncond_prompt
+    def _encode_uncond_prompt(self, batch_size, max_length):
+        # the unconditional prompt is always "", so its text encoder forward only depends on `max_length` (and on the
+        # text encoder itself), it is computed once for a single row and expanded to the batch
+        cache_key = self._get_uncond_cache_key(max_length)
+        if cache_key not in self._uncond_cache:
+            uncond_input = self.tokenizer(
+                [""],
+                padding="max_length",
+                max_length=max_length,
+                return_attention_mask=True,
+                truncation=True,
+                return_tensors="pd", )
+            with paddle.no_grad():
+                uncond_text_encoder_output = self.text_encoder(
+                    uncond_input.input_ids)
+            self._uncond_cache[cache_key] = (
+                uncond_text_encoder_output.text_embeds,
+                uncond_text_encoder_output.last_hidden_state,
+                uncond_input.attention_mask, )
+
+        negative_prompt_embeds, uncond_text_encoder_hidden_states, uncond_text_mask = self._uncond_cache[
+            cache_key]
+        return (
+            negative_prompt_embeds.expand([batch_size, -1]),
+            uncond_text_encoder_hidden_states.expand([batch_size, -1, -1]),
+            uncond_text_mask.expand([batch_size, -1]), )
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline._get_decoder_text_mask
+    def _get_decoder_text_mask(self, text_mask):
+        # the decoder also attends to the extra clip context tokens of `text_proj`, which are never masked. Their ones
+        # prefix only depends on the number of tokens and on the mask dtype, so it is created once and the mask is
+        # built with a single concat
+        num_tokens = self.text_proj.clip_extra_context_tokens
+        if (self._ones_prefix is None or
+                self._ones_prefix.shape[1] != num_tokens or
+                self._ones_prefix.dtype != text_mask.dtype):
+            self._ones_prefix = paddle.ones(
+                [1, num_tokens], dtype=text_mask.dtype)
+        return paddle.concat(
+            [self._ones_prefix.expand([text_mask.shape[0], -1]), text_mask],
+            axis=1)
+
+    # Copied from ppdiffusers.pipelines.unclip.pipeline_unclip.UnCLIPPipeline._get_timesteps
+    def _get_timesteps(self, decoder_num_inference_steps,
+                       super_res_num_inference_steps):
+        # the timesteps only depend on the number of steps (and on the schedulers, the cache is cleared when they
+        # are replaced), they are created once per combination instead of rebuilding them with `set_timesteps` in
+        # every call
+        cache_key = (decoder_num_inference_steps, super_res_num_inference_steps)
+        if cache_key not in self._sched_cache:
+            if len(self._sched_cache) >= self._max_sched_cache_size:
+                # drop the oldest combination, dicts keep the insertion order
+                self._sched_cache.pop(next(iter(self._sched_cache)))
+            self.decoder_scheduler.set_timesteps(decoder_num_inference_steps)
+            self.super_res_scheduler.set_timesteps(
+                super_res_num_inference_steps)
+            self._sched_cache[cache_key] = (self.decoder_scheduler.timesteps,
+                                            self.super_res_scheduler.timesteps)
+
+        decoder_timesteps_tensor, super_res_timesteps_tensor = self._sched_cache[
+            cache_key]
+        # keep the state of the schedulers consistent with the timesteps in use
+        self.decoder_scheduler.num_inference_steps = decoder_num_inference_steps
+        self.decoder_scheduler.timesteps = decoder_timesteps_tensor
+        self.super_res_scheduler.num_inference_steps = super_res_num_inference_steps
+        self.super_res_scheduler.timesteps = super_res_timesteps_tensor
+        return decoder_timesteps_tensor, super_res_timesteps_tensor
+
     def _encode_prompt(self, prompt, num_images_per_prompt,
                        do_classifier_free_guidance):
         batch_size = len(prompt) if isinstance(prompt, list) else 1
@@ -129,76 +348,31 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             return_tensors="pd", )
         text_input_ids = text_inputs.input_ids
         text_mask = text_inputs.attention_mask
-        text_encoder_output = self.text_encoder(text_input_ids)
-
-        prompt_embeds = text_encoder_output.text_embeds
-        text_encoder_hidden_states = text_encoder_output.last_hidden_state
-
-        # duplicate text embeddings for each generation per prompt
-        seq_len = prompt_embeds.shape[1]
-        prompt_embeds = prompt_embeds.tile([1, num_images_per_prompt])
-        prompt_embeds = prompt_embeds.reshape(
-            [batch_size * num_images_per_prompt, seq_len])
-
-        # duplicate text_encoder_hidden_states for each generation per prompt
-        seq_len = text_encoder_hidden_states.shape[1]
-        text_encoder_hidden_states = text_encoder_hidden_states.tile(
-            [1, num_images_per_prompt, 1])
-        text_encoder_hidden_states = text_encoder_hidden_states.reshape(
-            [batch_size * num_images_per_prompt, seq_len, -1])
-
-        # duplicate text_mask for each generation per prompt
-        seq_len = text_mask.shape[1]
-        text_mask = text_mask.tile([1, num_images_per_prompt])
-        text_mask = text_mask.reshape(
-            [batch_size * num_images_per_prompt, seq_len])
-
-        # prompt_embeds = prompt_embeds.repeat_interleave(num_images_per_prompt, axis=0)
-        # text_encoder_hidden_states = text_encoder_hidden_states.repeat_interleave(num_images_per_prompt, axis=0)
-        # text_mask = text_mask.repeat_interleave(num_images_per_prompt, axis=0)
+        if all(p == "" for p in prompt):
+            # the image variations are conditioned on empty prompts, which encode exactly like the unconditional
+            # prompt, so both halves come from the same cached text encoder forward
+            prompt_embeds, text_encoder_hidden_states, text_mask = self._encode_uncond_prompt(
+                batch_size, text_input_ids.shape[-1])
+        else:
+            text_encoder_output = self.text_encoder(text_input_ids)
 
-        if do_classifier_free_guidance:
-            uncond_tokens = [""] * batch_size
+            prompt_embeds = text_encoder_output.text_embeds
+            text_encoder_hidden_states = text_encoder_output.last_hidden_state
 
-            max_length = text_input_ids.shape[-1]
-            uncond_input = self.tokenizer(
-                uncond_tokens,
-                padding="max_length",
-                max_length=max_length,
-                return_attention_mask=True,
-                truncation=True,
-                return_tensors="pd", )
-            uncond_text_mask = uncond_input.attention_mask
-            negative_prompt_embeds_text_encoder_output = self.text_encoder(
-                uncond_input.input_ids)
-
-            negative_prompt_embeds = (
-                negative_prompt_embeds_text_encoder_output.text_embeds)
-            uncond_text_encoder_hidden_states = (
-                negative_prompt_embeds_text_encoder_output.last_hidden_state)
-
-            # duplicate unconditional embeddings for each generation per prompt, using mps friendly method
-
-            seq_len = negative_prompt_embeds.shape[1]
-            negative_prompt_embeds = negative_prompt_embeds.tile(
-                [1, num_images_per_prompt])
-            negative_prompt_embeds = negative_prompt_embeds.reshape(
-                [batch_size * num_images_per_prompt, seq_len])
-
-            seq_len = uncond_text_encoder_hidden_states.shape[1]
-            uncond_text_encoder_hidden_states = uncond_text_encoder_hidden_states.tile(
-                [1, num_images_per_prompt, 1])
-            uncond_text_encoder_hidden_states = (
-                uncond_text_encoder_hidden_states.reshape(
-                    [batch_size * num_images_per_prompt, seq_len, -1]))
-
-            # duplicate uncond_text_mask for each generation per prompt
-            seq_len = uncond_text_mask.shape[1]
-            uncond_text_mask = uncond_text_mask.tile([1, num_images_per_prompt])
-            uncond_text_mask = uncond_text_mask.reshape(
-                [batch_size * num_images_per_prompt, seq_len])
-            # uncond_text_mask = uncond_text_mask.repeat_interleave(num_images_per_prompt, axis=0)
-            # done duplicates
+        # duplicate text embeddings, hidden states and mask for each generation per prompt, `repeat_interleave` writes
+        # the duplicated rows in one pass instead of a `tile` followed by a `reshape`
+        if num_images_per_prompt > 1:
+            prompt_embeds = prompt_embeds.repeat_interleave(
+                num_images_per_prompt, axis=0)
+            text_encoder_hidden_states = text_encoder_hidden_states.repeat_interleave(
+                num_images_per_prompt, axis=0)
+            text_mask = text_mask.repeat_interleave(
+                num_images_per_prompt, axis=0)
+
+        if do_classifier_free_guidance:
+            (negative_prompt_embeds, uncond_text_encoder_hidden_states,
+             uncond_text_mask) = self._encode_uncond_prompt(
+                 batch_size * num_images_per_prompt, text_input_ids.shape[-1])
 
             # For classifier free guidance, we need to do two forward passes.
             # Here we concatenate the unconditional and text embeddings into a single batch
@@ -229,11 +403,9 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             image = image.cast(dtype)
             image_embeddings = self.image_encoder(image).image_embeds
 
-        batch_size, seq_len = image_embeddings.shape
-        image_embeddings = image_embeddings.tile([1, num_images_per_prompt])
-        image_embeddings = image_embeddings.reshape(
-            [batch_size * num_images_per_prompt, seq_len])
-        # image_embeddings = image_embeddings.repeat_interleave(num_images_per_prompt, axis=0)
+        if num_images_per_prompt > 1:
+            image_embeddings = image_embeddings.repeat_interleave(
+                num_images_per_prompt, axis=0)
 
         return image_embeddings
 
@@ -251,7 +423,8 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             image_embeddings: Optional[paddle.Tensor]=None,
             decoder_guidance_scale: float=8.0,
             output_type: Optional[str]="pil",
-            return_dict: bool=True, ):
+            return_dict: bool=True,
+            amp_dtype: Optional[str]=None, ):
         """
         Function invoked when calling the pipeline for generation.
 
@@ -289,6 +462,10 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
                 [PIL](https://pillow.readthedocs.io/en/stable/): `PIL.Image.Image` or `np.array`.
             return_dict (`bool`, *optional*, defaults to `True`):
                 Whether or not to return a [`~pipelines.ImagePipelineOutput`] instead of a plain tuple.
+            amp_dtype (`str`, *optional*):
+                If set to `"float16"` or `"bfloat16"`, the decoder and the super resolution unets run under
+                `paddle.amp.auto_cast` with that dtype, which also lets [`~DiffusionPipeline.enable_channels_last`]
+                switch their convolutions to NHWC. The latents and the scheduler steps stay in the dtype of the models.
         """
         if image is not None:
             if isinstance(image, PIL.Image.Image):
@@ -297,6 +474,12 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
                 batch_size = len(image)
             else:
                 batch_size = image.shape[0]
+            if image_embeddings is not None and image_embeddings.shape[
+                    0] != batch_size:
+                raise ValueError(
+                    f"`image_embeddings` has {image_embeddings.shape[0]} rows, but {batch_size} images were passed. "
+                    f"Pass one embedding per image, they are repeated `num_images_per_prompt` times."
+                )
         else:
             batch_size = image_embeddings.shape[0]
 
@@ -319,14 +502,10 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             text_encoder_hidden_states=text_encoder_hidden_states,
             do_classifier_free_guidance=do_classifier_free_guidance, )
 
-        decoder_text_mask = F.pad(
-            text_mask.unsqueeze(0),
-            (self.text_proj.clip_extra_context_tokens, 0),
-            value=1,
-            data_format="NCL", ).squeeze(0)
+        decoder_text_mask = self._get_decoder_text_mask(text_mask)
 
-        self.decoder_scheduler.set_timesteps(decoder_num_inference_steps)
-        decoder_timesteps_tensor = self.decoder_scheduler.timesteps
+        decoder_timesteps_tensor, super_res_timesteps_tensor = self._get_timesteps(
+            decoder_num_inference_steps, super_res_num_inference_steps)
 
         num_channels_latents = self.decoder.config.in_channels
         height = self.decoder.config.sample_size
@@ -340,52 +519,63 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
                 decoder_latents,
                 self.decoder_scheduler, )
 
+        if do_classifier_free_guidance:
+            # the decoder predicts the noise followed by the variance, guidance only applies to the noise channels
+            variance_channels = (
+                self.decoder.config.out_channels - num_channels_latents)
+            guidance_weight = paddle.to_tensor(
+                [decoder_guidance_scale - 1.0] * num_channels_latents +
+                [0.0] * variance_channels,
+                dtype=decoder_latents.dtype, ).reshape([1, -1, 1, 1])
+            # both halves of the guided batch are the latents, they are written into a buffer shared by all the steps
+            # instead of concatenating a new batch every step
+            latents_batch_size = decoder_latents.shape[0]
+            latent_model_input = paddle.empty(
+                [2 * latents_batch_size, *decoder_latents.shape[1:]],
+                dtype=decoder_latents.dtype)
+
+        # the scheduler steps index their coefficients with a device tensor instead of python scalars
+        decoder_step_indices = paddle.arange(decoder_timesteps_tensor.shape[0])
+        decoder_noise = self._prepare_step_noise(
+            decoder_timesteps_tensor.shape[0], decoder_latents, generator)
         for i, t in enumerate(self.progress_bar(decoder_timesteps_tensor)):
             # expand the latents if we are doing classifier free guidance
-            latent_model_input = (paddle.concat([decoder_latents] * 2)
-                                  if do_classifier_free_guidance else
-                                  decoder_latents)
-
-            noise_pred = self.decoder(
-                sample=latent_model_input,
-                timestep=t,
-                encoder_hidden_states=text_encoder_hidden_states,
-                class_labels=additive_clip_time_embeddings,
-                attention_mask=decoder_text_mask, ).sample
+            if do_classifier_free_guidance:
+                latent_model_input[:latents_batch_size] = decoder_latents
+                latent_model_input[latents_batch_size:] = decoder_latents
+            else:
+                latent_model_input = decoder_latents
+
+            with paddle.amp.auto_cast(
+                    enable=amp_dtype is not None, dtype=amp_dtype or "float16"):
+                noise_pred = self.decoder(
+                    sample=latent_model_input,
+                    timestep=t,
+                    encoder_hidden_states=text_encoder_hidden_states,
+                    class_labels=additive_clip_time_embeddings,
+                    attention_mask=decoder_text_mask, ).sample
+            if noise_pred.dtype != decoder_latents.dtype:
+                noise_pred = noise_pred.cast(decoder_latents.dtype)
 
             if do_classifier_free_guidance:
+                # uncond + s * (text - uncond) on the noise channels and the text branch on the variance channels,
+                # computed on all the channels at once instead of splitting and concatenating them back
                 noise_pred_uncond, noise_pred_text = noise_pred.chunk(2)
-                # paddle.split is not equal torch.split
-                noise_pred_uncond, _ = noise_pred_uncond.split(
-                    [
-                        latent_model_input.shape[1],
-                        noise_pred_uncond.shape[1] -
-                        latent_model_input.shape[1],
-                    ],
-                    axis=1, )
-                noise_pred_text, predicted_variance = noise_pred_text.split(
-                    [
-                        latent_model_input.shape[1],
-                        noise_pred_text.shape[1] - latent_model_input.shape[1],
-                    ],
-                    axis=1, )
-                noise_pred = noise_pred_uncond + decoder_guidance_scale * (
+                noise_pred = noise_pred_text + guidance_weight * (
                     noise_pred_text - noise_pred_uncond)
-                noise_pred = paddle.concat(
-                    [noise_pred, predicted_variance], axis=1)
 
+            # the last step adds no noise
             if i + 1 == decoder_timesteps_tensor.shape[0]:
-                prev_timestep = None
+                variance_noise = None
             else:
-                prev_timestep = decoder_timesteps_tensor[i + 1]
+                variance_noise = decoder_noise[i]
 
             # compute the previous noisy sample x_t -> x_t-1
-            decoder_latents = self.decoder_scheduler.step(
+            decoder_latents = self.decoder_scheduler.step_tensor(
                 noise_pred,
-                t,
+                decoder_step_indices[i],
                 decoder_latents,
-                prev_timestep=prev_timestep,
-                generator=generator, ).prev_sample
+                variance_noise, )
 
         decoder_latents = decoder_latents.clip(-1, 1)
 
@@ -395,9 +585,6 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
 
         # super res
 
-        self.super_res_scheduler.set_timesteps(super_res_num_inference_steps)
-        super_res_timesteps_tensor = self.super_res_scheduler.timesteps
-
         channels = self.super_res_first.config.in_channels // 2
         height = self.super_res_first.config.sample_size
         width = self.super_res_first.config.sample_size
@@ -405,22 +592,31 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
         if super_res_latents is None:
             super_res_latents = self.prepare_latents(
                 (batch_size, channels, height, width),
-                image_small.dtype,
+                self.super_res_first.dtype,
                 generator,
                 super_res_latents,
                 self.super_res_scheduler, )
 
-        interpolate_antialias = {}
-        if "antialias" in inspect.signature(F.interpolate).parameters:
-            interpolate_antialias["antialias"] = True
-
         image_upscaled = F.interpolate(
             image_small,
             size=[height, width],
             mode="bicubic",
             align_corners=False,
-            **interpolate_antialias, )
-
+            **_INTERPOLATE_ANTIALIAS_KWARGS, )
+        # the upscaled image is the same in every super resolution step, it is written (and cast) once into the second
+        # half of the unet input, the steps then only refresh the latents in the first half instead of concatenating
+        # both halves every step
+        if image_upscaled.dtype != super_res_latents.dtype:
+            image_upscaled = image_upscaled.cast(super_res_latents.dtype)
+        latent_model_input = paddle.empty(
+            [batch_size, 2 * channels, height, width],
+            dtype=super_res_latents.dtype)
+        latent_model_input[:, channels:] = image_upscaled
+
+        super_res_step_indices = paddle.arange(
+            super_res_timesteps_tensor.shape[0])
+        super_res_noise = self._prepare_step_noise(
+            super_res_timesteps_tensor.shape[0], super_res_latents, generator)
         for i, t in enumerate(self.progress_bar(super_res_timesteps_tensor)):
             # no classifier free guidance
 
@@ -429,29 +625,27 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
             else:
                 unet = self.super_res_first
 
-            latent_model_input = paddle.concat(
-                [
-                    super_res_latents,
-                    image_upscaled.cast(super_res_latents.dtype)
-                ],
-                axis=1, )
+            latent_model_input[:, :channels] = super_res_latents
 
-            noise_pred = unet(
-                sample=latent_model_input,
-                timestep=t, ).sample
+            with paddle.amp.auto_cast(
+                    enable=amp_dtype is not None, dtype=amp_dtype or "float16"):
+                noise_pred = unet(
+                    sample=latent_model_input,
+                    timestep=t, ).sample
+            if noise_pred.dtype != super_res_latents.dtype:
+                noise_pred = noise_pred.cast(super_res_latents.dtype)
 
             if i + 1 == super_res_timesteps_tensor.shape[0]:
-                prev_timestep = None
+                variance_noise = None
             else:
-                prev_timestep = super_res_timesteps_tensor[i + 1]
+                variance_noise = super_res_noise[i]
 
             # compute the previous noisy sample x_t -> x_t-1
-            super_res_latents = self.super_res_scheduler.step(
+            super_res_latents = self.super_res_scheduler.step_tensor(
                 noise_pred,
-                t,
+                super_res_step_indices[i],
                 super_res_latents,
-                prev_timestep=prev_timestep,
-                generator=generator, ).prev_sample
+                variance_noise, )
 
         image = super_res_latents
 
@@ -461,10 +655,12 @@ class UnCLIPImageVariationPipeline(DiffusionPipeline):
 
         image = image * 0.5 + 0.5
         image = image.clip(0, 1)
-        image = image.transpose([0, 2, 3, 1]).cast("float32").numpy()
-
         if output_type == "pil":
-            image = self.numpy_to_pil(image)
+            # quantize on device, so only one byte per channel is copied to host memory
+            image = paddle.round(image * 255).cast("uint8")
+            image = self.numpy_to_pil(image.transpose([0, 2, 3, 1]).numpy())
+        else:
+            image = image.transpose([0, 2, 3, 1]).cast("float32").numpy()
 
         if not return_dict:
             return (image, )
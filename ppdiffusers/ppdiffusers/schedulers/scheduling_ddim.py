@@ -67,14 +67,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps,
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
@@ -181,6 +177,7 @@ class DDIMScheduler(SchedulerMixin, ConfigMixin):
         self.num_inference_steps = None
         self.timesteps = paddle.to_tensor(
             np.arange(0, num_train_timesteps)[::-1].copy().astype(np.int64))
+        self._timesteps_cache = {}
 
     def scale_model_input(self,
                           sample: paddle.Tensor,
@@ -269,13 +266,17 @@ class DDIMScheduler(SchedulerMixin, ConfigMixin):
                 f" maximal {self.config.num_train_timesteps} timesteps.")
 
         self.num_inference_steps = num_inference_steps
-        step_ratio = self.config.num_train_timesteps // self.num_inference_steps
-        # creates integer timesteps by multiplying by ratio
-        # casting to int to avoid issues when num_inference_step is power of 3
-        timesteps = ((np.arange(0, num_inference_steps) * step_ratio)
-                     .round()[::-1].copy().astype(np.int64))
-        self.timesteps = paddle.to_tensor(timesteps)
-        self.timesteps += self.config.steps_offset
+        # the timesteps only depend on `num_inference_steps`, so they are only computed (and moved to the device) once
+        cache_key = (num_inference_steps, paddle.get_device())
+        if cache_key not in self._timesteps_cache:
+            step_ratio = self.config.num_train_timesteps // self.num_inference_steps
+            # creates integer timesteps by multiplying by ratio
+            # casting to int to avoid issues when num_inference_step is power of 3
+            timesteps = ((np.arange(0, num_inference_steps) * step_ratio)
+                         .round()[::-1].copy().astype(np.int64))
+            timesteps += self.config.steps_offset
+            self._timesteps_cache[cache_key] = paddle.to_tensor(timesteps)
+        self.timesteps = self._timesteps_cache[cache_key]
 
     def step(
             self,
@@ -46,14 +46,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps, max_beta=0.999):
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
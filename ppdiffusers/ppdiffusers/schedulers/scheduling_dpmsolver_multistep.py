@@ -45,14 +45,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps, max_beta=0.999):
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
@@ -215,9 +211,7 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
             log_sigmas = np.log(sigmas)
             sigmas = self._convert_to_karras(
                 in_sigmas=sigmas, num_inference_steps=num_inference_steps)
-            timesteps = np.array(
-                [self._sigma_to_t(sigma, log_sigmas)
-                 for sigma in sigmas]).round()
+            timesteps = self._sigma_to_t(sigmas, log_sigmas).round()
             timesteps = np.flip(timesteps).copy().astype(np.int64)
 
         # when num_inference_steps == num_train_timesteps, we can end up with
@@ -274,37 +268,27 @@ class DPMSolverMultistepScheduler(SchedulerMixin, ConfigMixin):
 
         return sample
 
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._sigma_to_t
     def _sigma_to_t(self, sigma, log_sigmas):
+        # `sigma` may be a single value or an array of them, all of them are mapped at once
         # get log sigma
         log_sigma = np.log(sigma)
 
-        # get distribution
-        dists = log_sigma - log_sigmas[:, np.newaxis]
-
-        # get sigmas range
-        low_idx = (np.cumsum(
-            (dists >= 0), axis=0).argmax(axis=0)
-                   .clip(max=log_sigmas.shape[0] - 2))
-        high_idx = low_idx + 1
-
-        low = log_sigmas[low_idx]
-        high = log_sigmas[high_idx]
-
-        # interpolate sigmas
-        w = (low - log_sigma) / (low - high)
-        w = np.clip(w, 0, 1)
-
-        # transform interpolation to time range
-        t = (1 - w) * low_idx + w * high_idx
+        # `log_sigmas` increases with the timestep, so the timestep of `log_sigma` is the piecewise linear
+        # interpolation of the train timesteps over `log_sigmas`. `np.interp` does the binary search, the
+        # interpolation and the clamping to the train range in one compiled pass without any temporaries
+        t = np.interp(log_sigma, log_sigmas, np.arange(log_sigmas.shape[0]))
         t = t.reshape(sigma.shape)
         return t
 
-    def _convert_to_karras(self, in_sigmas: paddle.Tensor,
-                           num_inference_steps) -> paddle.Tensor:
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._convert_to_karras
+    def _convert_to_karras(self, in_sigmas: np.ndarray,
+                           num_inference_steps) -> np.ndarray:
         """Constructs the noise schedule of Karras et al. (2022)."""
 
-        sigma_min = in_sigmas[-1].item()
-        sigma_max = in_sigmas[0].item()
+        # the sigmas are built on the host, reading their range needs no device sync
+        sigma_min = float(in_sigmas[-1])
+        sigma_max = float(in_sigmas[0])
 
         rho = 7.0  # 7.0 is the value used in the paper
         ramp = np.linspace(0, 1, num_inference_steps)
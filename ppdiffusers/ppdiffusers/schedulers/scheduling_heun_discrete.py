@@ -44,14 +44,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps,
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
@@ -117,8 +113,21 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
             raise NotImplementedError(
                 f"{beta_schedule} does is not implemented for {self.__class__}")
 
-        self.alphas = 1.0 - self.betas
-        self.alphas_cumprod = paddle.cumprod(self.alphas, 0)
+        # the cumulative product is computed on the host, where the train sigmas are derived from it, and copied to
+        # the device once
+        alphas = 1.0 - self.betas.numpy()
+        alphas_cumprod = np.cumprod(alphas)
+        self.alphas = paddle.to_tensor(alphas)
+        self.alphas_cumprod = paddle.to_tensor(alphas_cumprod)
+
+        # the train sigmas only depend on `alphas_cumprod`, they are computed on the host once instead of in every
+        # `set_timesteps`
+        alphas_cumprod = alphas_cumprod.astype(np.float64)
+        self._sigmas_train = ((1 - alphas_cumprod) / alphas_cumprod)**0.5
+        self._log_sigmas_train = np.log(self._sigmas_train)
+        self._train_timesteps = np.arange(len(self._sigmas_train))
+
+        self._schedule_cache = {}
 
         #  set all values
         self.set_timesteps(num_train_timesteps, num_train_timesteps)
@@ -128,13 +137,32 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         if schedule_timesteps is None:
             schedule_timesteps = self.timesteps
 
-        indices = (schedule_timesteps == timestep).nonzero()
-
+        if isinstance(timestep, paddle.Tensor):
+            # a single copy of the timestep to the host instead of a search and a copy of the result
+            timestep = float(timestep)
+
+        if schedule_timesteps is self.timesteps:
+            timestep_to_index = (self._timestep_to_index_last
+                                 if self.state_in_first_order else
+                                 self._timestep_to_index_first)
+            if timestep in timestep_to_index:
+                return timestep_to_index[timestep]
+
+        # the schedule decreases monotonically, so the last (first order) or first (second order) occurrence of
+        # `timestep` is found with a binary search on the host instead of an equality scan on the device
+        if isinstance(schedule_timesteps, paddle.Tensor):
+            schedule_timesteps = schedule_timesteps.numpy()
+        reversed_schedule = -np.asarray(schedule_timesteps)
         if self.state_in_first_order:
-            pos = -1
+            index = np.searchsorted(
+                reversed_schedule, -timestep, side="right") - 1
         else:
-            pos = 0
-        return indices[pos].item()
+            index = np.searchsorted(reversed_schedule, -timestep, side="left")
+        if not 0 <= index < len(reversed_schedule) or reversed_schedule[
+                index] != -timestep:
+            raise IndexError(
+                f"timestep {timestep} is not part of the schedule timesteps")
+        return int(index)
 
     def scale_model_input(
             self,
@@ -150,10 +178,53 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         """
         step_index = self.index_for_timestep(timestep)
 
-        sigma = self.sigmas[step_index]
-        sample = sample / ((sigma**2 + 1)**0.5)
+        sample = sample * self._scale_factors[step_index]
         return sample
 
+    def _compute_schedule(self, num_inference_steps: int,
+                          num_train_timesteps: int):
+        timesteps = np.linspace(
+            0, num_train_timesteps - 1, num_inference_steps,
+            dtype=float)[::-1].copy()
+
+        log_sigmas = self._log_sigmas_train
+        sigmas = np.interp(timesteps, self._train_timesteps,
+                           self._sigmas_train)
+
+        if self.use_karras_sigmas:
+            sigmas = self._convert_to_karras(
+                in_sigmas=sigmas, num_inference_steps=num_inference_steps)
+            timesteps = self._sigma_to_t(sigmas, log_sigmas)
+
+        # every step but the first one is done twice, the doubled schedules are built on the host and copied to the
+        # device once
+        sigmas = np.concatenate([sigmas, [0.0]]).astype(np.float32)
+        sigmas = np.concatenate(
+            [sigmas[:1], np.repeat(sigmas[1:-1], 2), sigmas[-1:]])
+        timesteps = np.concatenate(
+            [timesteps[:1], np.repeat(timesteps[1:], 2)]).astype(np.float32)
+        sigmas_tensor = paddle.to_tensor(sigmas)
+
+        # `sigma**2 + 1` and its square root for every step, `scale_model_input` and `step` multiply by python
+        # floats instead of gathering sigma and computing the factors on the device in every step
+        sigmas_host = sigmas.astype(np.float64)
+        sig2p1 = sigmas_host**2 + 1
+        sig2p1_sqrt = np.sqrt(sig2p1)
+
+        # the step index of every timestep of the schedule, looked up on the host by `index_for_timestep` instead of
+        # searching `self.timesteps` on the device. Every timestep but the first one appears twice, the first order
+        # step uses its last occurrence and the second order step its first one
+        timestep_to_index_first = {}
+        timestep_to_index_last = {}
+        for i, t in enumerate(timesteps.tolist()):
+            timestep_to_index_first.setdefault(t, i)
+            timestep_to_index_last[t] = i
+
+        return (sigmas_tensor, paddle.to_tensor(timesteps),
+                sigmas_host.tolist(), sig2p1.tolist(), sig2p1_sqrt.tolist(),
+                (1.0 / sig2p1_sqrt).tolist(), timestep_to_index_first,
+                timestep_to_index_last)
+
     def set_timesteps(
             self,
             num_inference_steps: int,
@@ -169,70 +240,47 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
 
         num_train_timesteps = num_train_timesteps or self.config.num_train_timesteps
 
-        timesteps = np.linspace(
-            0, num_train_timesteps - 1, num_inference_steps,
-            dtype=float)[::-1].copy()
-
-        sigmas = np.array(((1 - self.alphas_cumprod) / self.alphas_cumprod)**
-                          0.5)
-        log_sigmas = np.log(sigmas)
-        sigmas = np.interp(timesteps, np.arange(0, len(sigmas)), sigmas)
-
-        if self.use_karras_sigmas:
-            sigmas = self._convert_to_karras(
-                in_sigmas=sigmas, num_inference_steps=self.num_inference_steps)
-            timesteps = np.array(
-                [self._sigma_to_t(sigma, log_sigmas) for sigma in sigmas])
-
-        sigmas = np.concatenate([sigmas, [0.0]]).astype(np.float32)
-        sigmas = paddle.to_tensor(sigmas)
-        self.sigmas = paddle.concat(
-            [sigmas[:1], sigmas[1:-1].repeat_interleave(2), sigmas[-1:]])
+        # the schedule only depends on these values, so it is only computed (and moved to the device) once
+        cache_key = (num_inference_steps, num_train_timesteps,
+                     bool(self.use_karras_sigmas), paddle.get_device())
+        if cache_key not in self._schedule_cache:
+            self._schedule_cache[cache_key] = self._compute_schedule(
+                num_inference_steps, num_train_timesteps)
+        (self.sigmas, self.timesteps, self._sigmas_host, self._sig2p1,
+         self._sig2p1_sqrt, self._scale_factors, self._timestep_to_index_first,
+         self._timestep_to_index_last) = self._schedule_cache[cache_key]
 
         # standard deviation of the initial noise distribution
         self.init_noise_sigma = self.sigmas.max()
 
-        timesteps = paddle.to_tensor(timesteps)
-        timesteps = paddle.concat(
-            [timesteps[:1], timesteps[1:].repeat_interleave(2)])
-
-        self.timesteps = timesteps.cast(paddle.float32)
+        # `self.sigmas` cast to the dtypes `add_noise` was called with
+        self._sigmas_by_dtype = {}
 
         # empty dt and derivative
         self.prev_derivative = None
         self.dt = None
 
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._sigma_to_t
     def _sigma_to_t(self, sigma, log_sigmas):
+        # `sigma` may be a single value or an array of them, all of them are mapped at once
         # get log sigma
         log_sigma = np.log(sigma)
 
-        # get distribution
-        dists = log_sigma - log_sigmas[:, np.newaxis]
-
-        # get sigmas range
-        low_idx = (np.cumsum(
-            (dists >= 0), axis=0).argmax(axis=0)
-                   .clip(max=log_sigmas.shape[0] - 2))
-        high_idx = low_idx + 1
-
-        low = log_sigmas[low_idx]
-        high = log_sigmas[high_idx]
-
-        # interpolate sigmas
-        w = (low - log_sigma) / (low - high)
-        w = np.clip(w, 0, 1)
-
-        # transform interpolation to time range
-        t = (1 - w) * low_idx + w * high_idx
+        # `log_sigmas` increases with the timestep, so the timestep of `log_sigma` is the piecewise linear
+        # interpolation of the train timesteps over `log_sigmas`. `np.interp` does the binary search, the
+        # interpolation and the clamping to the train range in one compiled pass without any temporaries
+        t = np.interp(log_sigma, log_sigmas, np.arange(log_sigmas.shape[0]))
         t = t.reshape(sigma.shape)
         return t
 
-    def _convert_to_karras(self, in_sigmas: paddle.Tensor,
-                           num_inference_steps) -> paddle.Tensor:
+    # Copied from ppdiffusers.schedulers.scheduling_euler_discrete.EulerDiscreteScheduler._convert_to_karras
+    def _convert_to_karras(self, in_sigmas: np.ndarray,
+                           num_inference_steps) -> np.ndarray:
         """Constructs the noise schedule of Karras et al. (2022)."""
 
-        sigma_min = in_sigmas[-1].item()
-        sigma_max = in_sigmas[0].item()
+        # the sigmas are built on the host, reading their range needs no device sync
+        sigma_min = float(in_sigmas[-1])
+        sigma_max = float(in_sigmas[0])
 
         rho = 7.0  # 7.0 is the value used in the paper
         ramp = np.linspace(0, 1, num_inference_steps)
@@ -266,13 +314,14 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         """
         step_index = self.index_for_timestep(timestep)
 
+        # the sigmas are read from the host table, so `dt` and the coefficients below are python floats
         if self.state_in_first_order:
-            sigma = self.sigmas[step_index]
-            sigma_next = self.sigmas[step_index + 1]
+            sigma = self._sigmas_host[step_index]
+            sigma_next = self._sigmas_host[step_index + 1]
         else:
             # 2nd order / Heun's method
-            sigma = self.sigmas[step_index - 1]
-            sigma_next = self.sigmas[step_index]
+            sigma = self._sigmas_host[step_index - 1]
+            sigma_next = self._sigmas_host[step_index]
 
         # currently only gamma=0 is supported. This usually works best anyways.
         # We can support gamma in the future but then need to scale the timestep before
@@ -280,14 +329,22 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
         gamma = 0
         sigma_hat = sigma * (gamma + 1)  # Note: sigma_hat == sigma for now
 
-        # 1. compute predicted original sample (x_0) from sigma-scaled predicted noise
+        # `sigma_input` is `sigma_hat` in the first order and `sigma_next` in the second one, i.e. the sigma of
+        # `step_index` in both orders
+        sigma_input = self._sigmas_host[step_index]
+
+        # 1. compute the ODE derivative `(sample - pred_original_sample) / sigma_input` from the predicted original
+        # sample (x_0)
         if self.config.prediction_type == "epsilon":
-            sigma_input = sigma_hat if self.state_in_first_order else sigma_next
-            pred_original_sample = sample - sigma_input * model_output
+            # `pred_original_sample = sample - sigma_input * model_output`, so the derivative is the model output itself
+            # and x_0 is never formed
+            derivative = model_output
         elif self.config.prediction_type == "v_prediction":
-            sigma_input = sigma_hat if self.state_in_first_order else sigma_next
-            pred_original_sample = model_output * (-sigma_input / (
-                sigma_input**2 + 1)**0.5) + (sample / (sigma_input**2 + 1))
+            # with `pred_original_sample = model_output * (-sigma_input / (sigma_input**2 + 1)**0.5) +
+            # sample / (sigma_input**2 + 1)` the derivative folds into two scaled adds with host coefficients
+            sample_coeff = sigma_input / self._sig2p1[step_index]
+            model_output_coeff = 1 / self._sig2p1_sqrt[step_index]
+            derivative = sample * sample_coeff + model_output * model_output_coeff
         elif self.config.prediction_type == "sample":
             raise NotImplementedError(
                 "prediction_type not implemented yet: sample")
@@ -297,9 +354,7 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
             )
 
         if self.state_in_first_order:
-            # 2. Convert to an ODE derivative for 1st order
-            derivative = (sample - pred_original_sample) / sigma_hat
-            # 3. delta timestep
+            # 2. delta timestep
             dt = sigma_next - sigma_hat
 
             # store for 2nd order step
@@ -308,7 +363,6 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
             self.sample = sample
         else:
             # 2. 2nd order / Heun's method
-            derivative = (sample - pred_original_sample) / sigma_next
             derivative = (self.prev_derivative + derivative) / 2
 
             # 3. take prev timestep & sample
@@ -333,15 +387,36 @@ class HeunDiscreteScheduler(SchedulerMixin, ConfigMixin):
             original_samples: paddle.Tensor,
             noise: paddle.Tensor,
             timesteps: paddle.Tensor, ) -> paddle.Tensor:
-        # Make sure sigmas and timesteps have the same dtype as original_samples
-        sigmas = self.sigmas.cast(original_samples.dtype)
-
+        # Make sure sigmas and timesteps have the same dtype as original_samples, the cast is done once per dtype
+        # and schedule instead of in every training step
+        sigmas = self._sigmas_by_dtype.get(original_samples.dtype)
+        if sigmas is None:
+            sigmas = self.sigmas.cast(original_samples.dtype)
+            self._sigmas_by_dtype[original_samples.dtype] = sigmas
+
+        # match the whole batch of timesteps against the schedule at once instead of one search (and sync) per
+        # timestep, with the same occurrence rule as `index_for_timestep`
         schedule_timesteps = self.timesteps
-        step_indices = [
-            self.index_for_timestep(t, schedule_timesteps) for t in timesteps
-        ]
+        timesteps = timesteps.cast(schedule_timesteps.dtype).flatten()
+        matches = schedule_timesteps.unsqueeze(0) == timesteps.unsqueeze(1)
+        # `argmax` of a row without any match is 0, which would silently use the first sigma
+        found = matches.any(axis=1)
+        if not bool(found.all()):
+            missing = paddle.masked_select(timesteps,
+                                           paddle.logical_not(found))
+            raise IndexError(
+                f"timesteps {missing.tolist()} are not part of the schedule timesteps"
+            )
+        matches = matches.cast("int32")
+        if self.state_in_first_order:
+            # last occurrence
+            step_indices = schedule_timesteps.shape[0] - 1 - paddle.flip(
+                matches, axis=[1]).argmax(axis=1)
+        else:
+            # first occurrence
+            step_indices = matches.argmax(axis=1)
 
-        sigma = sigmas[step_indices].flatten()
+        sigma = paddle.gather(sigmas, step_indices).flatten()
         while len(sigma.shape) < len(original_samples.shape):
             sigma = sigma.unsqueeze(-1)
 
@@ -47,6 +47,7 @@ class IPNDMScheduler(SchedulerMixin, ConfigMixin):
             num_train_timesteps: int=1000,
             trained_betas: Optional[Union[np.ndarray, List[float]]]=None, ):
         # set `betas`, `alphas`, `timesteps`
+        self._schedule_cache = {}
         self.set_timesteps(num_train_timesteps)
 
         # standard deviation of the initial noise distribution
@@ -69,19 +70,25 @@ class IPNDMScheduler(SchedulerMixin, ConfigMixin):
                 the number of diffusion steps used when generating samples with a pre-trained model.
         """
         self.num_inference_steps = num_inference_steps
-        steps = paddle.linspace(1, 0, num_inference_steps + 1)[:-1]
-        steps = paddle.concat([steps, paddle.to_tensor([0.0])])
-
-        if self.config.trained_betas is not None:
-            self.betas = paddle.to_tensor(
-                self.config.trained_betas, dtype=paddle.float32)
-        else:
-            self.betas = paddle.sin(steps * math.pi / 2)**2
-
-        self.alphas = (1.0 - self.betas**2)**0.5
-
-        self.timesteps = (paddle.atan2(self.betas, self.alphas) / math.pi *
-                          2)[:-1]
+        # the schedule only depends on `num_inference_steps`, so it is only computed (and moved to the device) once
+        cache_key = (num_inference_steps, paddle.get_device())
+        if cache_key not in self._schedule_cache:
+            steps = paddle.linspace(1, 0, num_inference_steps + 1)[:-1]
+            steps = paddle.concat([steps, paddle.to_tensor([0.0])])
+
+            if self.config.trained_betas is not None:
+                betas = paddle.to_tensor(
+                    self.config.trained_betas, dtype=paddle.float32)
+            else:
+                betas = paddle.sin(steps * math.pi / 2)**2
+
+            alphas = (1.0 - betas**2)**0.5
+
+            timesteps = (paddle.atan2(betas, alphas) / math.pi * 2)[:-1]
+            self._schedule_cache[cache_key] = (betas, alphas, timesteps,
+                                               timesteps.tolist())
+        (self.betas, self.alphas, self.timesteps,
+         self._timesteps_host) = self._schedule_cache[cache_key]
 
         self.ets = []
 
@@ -116,7 +123,11 @@ class IPNDMScheduler(SchedulerMixin, ConfigMixin):
                 "Number of inference steps is 'None', you need to run 'set_timesteps' after creating the scheduler"
             )
 
-        timestep_index = (self.timesteps == timestep).nonzero().item()
+        if paddle.is_tensor(timestep):
+            timestep_index = (self.timesteps == timestep).nonzero().item()
+        else:
+            # python scalars are looked up on the host, which avoids a device sync every step
+            timestep_index = self._timesteps_host.index(timestep)
         prev_timestep_index = timestep_index + 1
 
         ets = (sample * self.betas[timestep_index] + model_output *
@@ -45,14 +45,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps, max_beta=0.999):
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
@@ -133,6 +129,11 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
 
         self.final_alpha_cumprod = (paddle.to_tensor(1.0) if set_alpha_to_one
                                     else self.alphas_cumprod[0])
+        # host copies of the cumulative alphas, the per-step update coefficients are plain python floats so that the
+        # update itself is only two fused elementwise kernels
+        self._alphas_cumprod_host = self.alphas_cumprod.numpy().tolist()
+        self._final_alpha_cumprod_host = (
+            1.0 if set_alpha_to_one else self._alphas_cumprod_host[0])
 
         # standard deviation of the initial noise distribution
         self.init_noise_sigma = 1.0
@@ -154,49 +155,57 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         self.prk_timesteps = None
         self.plms_timesteps = None
         self.timesteps = None
+        self._schedule_cache = {}
 
-    def set_timesteps(self, num_inference_steps: int):
-        """
-        Sets the discrete timesteps used for the diffusion chain. Supporting function to be run before inference.
-
-        Args:
-            num_inference_steps (`int`):
-                the number of diffusion steps used when generating samples with a pre-trained model.
-        """
-
-        self.num_inference_steps = num_inference_steps
-        step_ratio = self.config.num_train_timesteps // self.num_inference_steps
+    def _compute_schedule(self, num_inference_steps: int):
+        step_ratio = self.config.num_train_timesteps // num_inference_steps
         # creates integer timesteps by multiplying by ratio
         # casting to int to avoid issues when num_inference_step is power of 3
-        self._timesteps = (np.arange(0, num_inference_steps) *
-                           step_ratio).round()
-        self._timesteps += self.config.steps_offset
+        _timesteps = (np.arange(0, num_inference_steps) * step_ratio).round()
+        _timesteps += self.config.steps_offset
 
         if self.config.skip_prk_steps:
             # for some models like stable diffusion the prk steps can/should be skipped to
             # produce better results. When using PNDM with `self.config.skip_prk_steps` the implementation
             # is based on crowsonkb's PLMS sampler implementation: https://github.com/CompVis/latent-diffusion/pull/51
-            self.prk_timesteps = np.array([])
-            self.plms_timesteps = np.concatenate([
-                self._timesteps[:-1], self._timesteps[-2:-1],
-                self._timesteps[-1:]
+            prk_timesteps = np.array([])
+            plms_timesteps = np.concatenate([
+                _timesteps[:-1], _timesteps[-2:-1], _timesteps[-1:]
             ])[::-1].copy()
         else:
-            prk_timesteps = np.array(self._timesteps[-self.pndm_order:]).repeat(
+            prk_timesteps = np.array(_timesteps[-self.pndm_order:]).repeat(
                 2) + np.tile(
                     np.array([
                         0, self.config.num_train_timesteps //
                         num_inference_steps // 2
                     ]),
                     self.pndm_order, )
-            self.prk_timesteps = (
-                prk_timesteps[:-1].repeat(2)[1:-1])[::-1].copy()
-            self.plms_timesteps = self._timesteps[:-3][::-1].copy(
+            prk_timesteps = (prk_timesteps[:-1].repeat(2)[1:-1])[::-1].copy()
+            plms_timesteps = _timesteps[:-3][::-1].copy(
             )  # we copy to avoid having negative strides which are not supported by paddle
 
-        timesteps = np.concatenate(
-            [self.prk_timesteps, self.plms_timesteps]).astype(np.int64)
-        self.timesteps = paddle.to_tensor(timesteps)
+        timesteps = np.concatenate([prk_timesteps, plms_timesteps]).astype(
+            np.int64)
+        return _timesteps, prk_timesteps, plms_timesteps, paddle.to_tensor(
+            timesteps)
+
+    def set_timesteps(self, num_inference_steps: int):
+        """
+        Sets the discrete timesteps used for the diffusion chain. Supporting function to be run before inference.
+
+        Args:
+            num_inference_steps (`int`):
+                the number of diffusion steps used when generating samples with a pre-trained model.
+        """
+
+        self.num_inference_steps = num_inference_steps
+        # the schedule only depends on `num_inference_steps`, so it is only computed (and moved to the device) once
+        cache_key = (num_inference_steps, paddle.get_device())
+        if cache_key not in self._schedule_cache:
+            self._schedule_cache[cache_key] = self._compute_schedule(
+                num_inference_steps)
+        (self._timesteps, self.prk_timesteps, self.plms_timesteps,
+         self.timesteps) = self._schedule_cache[cache_key]
 
         self.ets = []
         self.counter = 0
@@ -395,9 +404,11 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         # sample -> x_t
         # model_output -> e_θ(x_t, t)
         # prev_sample -> x_(t−δ)
-        alpha_prod_t = self.alphas_cumprod[timestep]
-        alpha_prod_t_prev = (self.alphas_cumprod[prev_timestep] if
-                             prev_timestep >= 0 else self.final_alpha_cumprod)
+        timestep, prev_timestep = int(timestep), int(prev_timestep)
+        alpha_prod_t = self._alphas_cumprod_host[timestep]
+        alpha_prod_t_prev = (self._alphas_cumprod_host[prev_timestep]
+                             if prev_timestep >= 0 else
+                             self._final_alpha_cumprod_host)
         beta_prod_t = 1 - alpha_prod_t
         beta_prod_t_prev = 1 - alpha_prod_t_prev
 
@@ -418,11 +429,11 @@ class PNDMScheduler(SchedulerMixin, ConfigMixin):
         # corresponds to denominator of e_θ(x_t, t) in formula (9)
         model_output_denom_coeff = alpha_prod_t * beta_prod_t_prev**(0.5) + (
             alpha_prod_t * beta_prod_t * alpha_prod_t_prev)**(0.5)
+        model_output_coeff = (
+            alpha_prod_t_prev - alpha_prod_t) / model_output_denom_coeff
 
         # full formula (9)
-        prev_sample = (sample_coeff * sample -
-                       (alpha_prod_t_prev - alpha_prod_t
-                        ) * model_output / model_output_denom_coeff)
+        prev_sample = sample_coeff * sample - model_output_coeff * model_output
 
         return prev_sample
 
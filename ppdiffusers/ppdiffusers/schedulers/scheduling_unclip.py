@@ -63,14 +63,10 @@ def betas_for_alpha_bar(num_diffusion_timesteps, max_beta=0.999):
         betas (`np.ndarray`): the betas used by the scheduler to step the model outputs
     """
 
-    def alpha_bar(time_step):
-        return math.cos((time_step + 0.008) / 1.008 * math.pi / 2)**2
-
-    betas = []
-    for i in range(num_diffusion_timesteps):
-        t1 = i / num_diffusion_timesteps
-        t2 = (i + 1) / num_diffusion_timesteps
-        betas.append(min(1 - alpha_bar(t2) / alpha_bar(t1), max_beta))
+    time_steps = (np.arange(num_diffusion_timesteps + 1) /
+                  num_diffusion_timesteps)
+    alpha_bar = np.cos((time_steps + 0.008) / 1.008 * math.pi / 2)**2
+    betas = np.minimum(1 - alpha_bar[1:] / alpha_bar[:-1], max_beta)
     return paddle.to_tensor(betas, dtype=paddle.float32)
 
 
@@ -130,6 +126,9 @@ class UnCLIPScheduler(SchedulerMixin, ConfigMixin):
 
         self.variance_type = variance_type
 
+        # per step coefficient tables of `step_tensor`, keyed by `num_inference_steps`
+        self._step_tables = {}
+
     def scale_model_input(self,
                           sample: paddle.Tensor,
                           timestep: Optional[int]=None) -> paddle.Tensor:
@@ -206,6 +205,141 @@ class UnCLIPScheduler(SchedulerMixin, ConfigMixin):
 
         return variance
 
+    def _get_step_tables(self):
+        # the coefficients of `step` only depend on the current and the previous timestep, so they are computed once
+        # on the host for every step of the schedule (the previous timestep of a step is the next entry of
+        # `self.timesteps`, `t - 1` for the last one) and indexed on the device by `step_tensor`
+        if self.num_inference_steps in self._step_tables:
+            return self._step_tables[self.num_inference_steps]
+
+        timesteps = self.timesteps.numpy().astype(np.int64)
+        alphas_cumprod = self.alphas_cumprod.numpy().astype(np.float64)
+        betas = self.betas.numpy().astype(np.float64)
+        alphas = self.alphas.numpy().astype(np.float64)
+        columns = {
+            name: []
+            for name in [
+                "sample_coeff", "model_output_coeff",
+                "pred_original_sample_coeff", "current_sample_coeff",
+                "std", "min_log", "max_log", "noise_mask"
+            ]
+        }
+        for i, t in enumerate(timesteps):
+            prev_t = timesteps[i + 1] if i + 1 < len(timesteps) else t - 1
+            alpha_prod_t = alphas_cumprod[t]
+            alpha_prod_t_prev = alphas_cumprod[prev_t] if prev_t >= 0 else 1.0
+            beta_prod_t = 1 - alpha_prod_t
+            beta_prod_t_prev = 1 - alpha_prod_t_prev
+            if prev_t == t - 1:
+                beta = betas[t]
+                alpha = alphas[t]
+            else:
+                beta = 1 - alpha_prod_t / alpha_prod_t_prev
+                alpha = 1 - beta
+            variance = beta_prod_t_prev / beta_prod_t * beta
+            has_noise = t > 0
+
+            columns["sample_coeff"].append(1 / alpha_prod_t**0.5)
+            columns["model_output_coeff"].append(beta_prod_t**0.5 /
+                                                 alpha_prod_t**0.5)
+            columns["pred_original_sample_coeff"].append(
+                alpha_prod_t_prev**0.5 * beta / beta_prod_t)
+            columns["current_sample_coeff"].append(alpha**0.5 *
+                                                   beta_prod_t_prev /
+                                                   beta_prod_t)
+            columns["std"].append(
+                max(variance, 1e-20)**0.5 if has_noise else 0.0)
+            # the log values of the last step are never used, keep them finite so masking them yields zeros
+            columns["min_log"].append(
+                np.log(variance) if has_noise else 0.0)
+            columns["max_log"].append(np.log(beta) if has_noise else 0.0)
+            columns["noise_mask"].append(1.0 if has_noise else 0.0)
+
+        tables = {
+            name: paddle.to_tensor(
+                values, dtype=paddle.float32)
+            for name, values in columns.items()
+        }
+        self._step_tables[self.num_inference_steps] = tables
+        return tables
+
+    def step_tensor(
+            self,
+            model_output: paddle.Tensor,
+            step_index: paddle.Tensor,
+            sample: paddle.Tensor,
+            noise: Optional[paddle.Tensor]=None, ) -> paddle.Tensor:
+        """
+        Same update as [`~UnCLIPScheduler.step`] with the previous timestep of the schedule, as a fixed sequence of
+        tensor ops. The coefficients are gathered from tables precomputed for `self.timesteps` with a device tensor
+        `step_index`, and the noise is given instead of sampled, so the step has no python scalars, no host syncs and
+        no random state, and can be captured in a graph together with the model forward.
+
+        Args:
+            model_output (`paddle.Tensor`): direct output from learned diffusion model.
+            step_index (`paddle.Tensor`): the index of the current timestep in `self.timesteps`, on the device.
+            sample (`paddle.Tensor`):
+                current instance of sample being created by diffusion process.
+            noise (`paddle.Tensor`, *optional*):
+                standard normal noise with the shape of `sample`. It is scaled by the standard deviation of the step,
+                which is zero for the last step, so it may be `None` there.
+
+        Returns:
+            `paddle.Tensor`: the sample at the previous timestep.
+        """
+        tables = self._get_step_tables()
+
+        def gather(name):
+            value = paddle.gather(tables[name], step_index)
+            if value.dtype != sample.dtype:
+                value = value.cast(sample.dtype)
+            return value
+
+        if (model_output.shape[1] == sample.shape[1] * 2 and
+                self.variance_type == "learned_range"):
+            model_output, predicted_variance = model_output.split(
+                [sample.shape[1], model_output.shape[1] - sample.shape[1]],
+                axis=1)
+        else:
+            predicted_variance = None
+
+        if self.config.prediction_type == "epsilon":
+            pred_original_sample = gather("sample_coeff") * sample - gather(
+                "model_output_coeff") * model_output
+        elif self.config.prediction_type == "sample":
+            pred_original_sample = model_output
+        else:
+            raise ValueError(
+                f"prediction_type given as {self.config.prediction_type} must be one of `epsilon` or `sample`"
+                " for the UnCLIPScheduler.")
+
+        if self.config.clip_sample:
+            pred_original_sample = paddle.clip(
+                pred_original_sample,
+                -self.config.clip_sample_range,
+                self.config.clip_sample_range, )
+
+        pred_prev_sample = (
+            gather("pred_original_sample_coeff") * pred_original_sample +
+            gather("current_sample_coeff") * sample)
+
+        if noise is None:
+            return pred_prev_sample
+
+        if self.variance_type == "fixed_small_log":
+            std = gather("std")
+        elif self.variance_type == "learned_range":
+            frac = (predicted_variance + 1) / 2
+            std = (0.5 * (frac * gather("max_log") +
+                          (1 - frac) * gather("min_log"))).exp() * gather(
+                              "noise_mask")
+        else:
+            raise ValueError(
+                f"variance_type given as {self.variance_type} must be one of `fixed_small_log` or `learned_range`"
+                " for the UnCLIPScheduler.")
+
+        return pred_prev_sample + std * noise
+
     def step(
             self,
             model_output: paddle.Tensor,
@@ -13,57 +13,93 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import inspect
+import sys
 import warnings
 from typing import Any, Dict, Optional, Union
 
 from packaging import version
 
+from ..version import VERSION as __version__
+
+_CURRENT_VERSION = version.parse(version.parse(__version__).base_version)
+
+# `version_name`s already checked against the current version, `deprecate` is called from hot paths and parsing a
+# version string is much more expensive than the rest of the call
+_checked_version_names = set()
+
+
+# returned by `_deprecate_one` when `take_from` holds no value for the deprecated attribute
+_NO_VALUE = object()
+
+
+def _deprecate_one(attribute, version_name, message, deprecated_kwargs,
+                   standard_warn, stacklevel):
+    # `stacklevel` already accounts for this helper
+    if version_name not in _checked_version_names:
+        if _CURRENT_VERSION >= version.parse(version_name):
+            raise ValueError(
+                f"The deprecation tuple {(attribute, version_name, message)} should be removed since ppdiffusers'"
+                f" version {__version__} is >= {version_name}")
+        _checked_version_names.add(version_name)
+
+    value = _NO_VALUE
+    warning = None
+    if isinstance(deprecated_kwargs, dict) and attribute in deprecated_kwargs:
+        value = deprecated_kwargs.pop(attribute)
+        warning = f"The `{attribute}` argument is deprecated and will be removed in version {version_name}."
+    elif hasattr(deprecated_kwargs, attribute):
+        value = getattr(deprecated_kwargs, attribute)
+        warning = f"The `{attribute}` attribute is deprecated and will be removed in version {version_name}."
+    elif deprecated_kwargs is None:
+        warning = f"`{attribute}` is deprecated and will be removed in version {version_name}."
+
+    if warning is not None:
+        warning = warning + " " if standard_warn else ""
+        warnings.warn(
+            warning + message, FutureWarning, stacklevel=stacklevel)
+    return value
+
+
+def _raise_unexpected_kwarg(deprecated_kwargs):
+    # only the frame calling `deprecate` is needed, so read it directly instead of materializing the whole stack
+    call_frame = sys._getframe(2)
+    filename = call_frame.f_code.co_filename
+    line_number = call_frame.f_lineno
+    function = call_frame.f_code.co_name
+    key, value = next(iter(deprecated_kwargs.items()))
+    raise TypeError(
+        f"{function} in {filename} line {line_number-1} got an unexpected keyword argument `{key}`"
+    )
+
 
 def deprecate(
         *args,
         take_from: Optional[Union[Dict, Any]]=None,
         standard_warn=True,
         stacklevel=2, ):
-    from ..version import VERSION as __version__
-
     deprecated_kwargs = take_from
+
+    # a single unpacked `(attribute, version_name, message)` is by far the most common call, it skips the packing
+    # and the loop over the tuples
+    if len(args) == 3 and isinstance(args[0], str):
+        value = _deprecate_one(args[0], args[1], args[2], deprecated_kwargs,
+                               standard_warn, stacklevel + 1)
+        if isinstance(deprecated_kwargs, dict) and len(deprecated_kwargs) > 0:
+            _raise_unexpected_kwarg(deprecated_kwargs)
+        return None if value is _NO_VALUE else value
+
     values = ()
     if not isinstance(args[0], tuple):
         args = (args, )
 
     for attribute, version_name, message in args:
-        if version.parse(version.parse(__version__)
-                         .base_version) >= version.parse(version_name):
-            raise ValueError(
-                f"The deprecation tuple {(attribute, version_name, message)} should be removed since ppdiffusers'"
-                f" version {__version__} is >= {version_name}")
-
-        warning = None
-        if isinstance(deprecated_kwargs,
-                      dict) and attribute in deprecated_kwargs:
-            values += (deprecated_kwargs.pop(attribute), )
-            warning = f"The `{attribute}` argument is deprecated and will be removed in version {version_name}."
-        elif hasattr(deprecated_kwargs, attribute):
-            values += (getattr(deprecated_kwargs, attribute), )
-            warning = f"The `{attribute}` attribute is deprecated and will be removed in version {version_name}."
-        elif deprecated_kwargs is None:
-            warning = f"`{attribute}` is deprecated and will be removed in version {version_name}."
-
-        if warning is not None:
-            warning = warning + " " if standard_warn else ""
-            warnings.warn(
-                warning + message, FutureWarning, stacklevel=stacklevel)
+        value = _deprecate_one(attribute, version_name, message,
+                               deprecated_kwargs, standard_warn, stacklevel + 1)
+        if value is not _NO_VALUE:
+            values += (value, )
 
     if isinstance(deprecated_kwargs, dict) and len(deprecated_kwargs) > 0:
-        call_frame = inspect.getouterframes(inspect.currentframe())[1]
-        filename = call_frame.filename
-        line_number = call_frame.lineno
-        function = call_frame.function
-        key, value = next(iter(deprecated_kwargs.items()))
-        raise TypeError(
-            f"{function} in {filename} line {line_number-1} got an unexpected keyword argument `{key}`"
-        )
+        _raise_unexpected_kwarg(deprecated_kwargs)
 
     if len(values) == 0:
         return
@@ -143,6 +143,7 @@ if is_paddle_available():
         will always be created on CPU.
         """
         if isinstance(generator, (list, tuple)):
+            # paddle has no random kernel seeded per sample, so every generator draws its own slice of the batch
             batch_size = shape[0]
             shape = (1, ) + tuple(shape[1:])
             latents = [
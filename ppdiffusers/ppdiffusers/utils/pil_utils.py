@@ -13,6 +13,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import PIL.Image
 import PIL.ImageOps
 from packaging import version
@@ -51,20 +56,59 @@ def pd_to_pil(images):
     return images
 
 
+# shared by all the `numpy_to_pil` calls, created on the first batch and grown for larger ones. The lock guards its
+# creation and the submission of the conversions, so an executor is never shut down while a call submits to it
+_PIL_EXECUTOR = None
+_PIL_EXECUTOR_WORKERS = 0
+_PIL_EXECUTOR_LOCK = threading.Lock()
+
+
+def _shutdown_pil_executor():
+    global _PIL_EXECUTOR, _PIL_EXECUTOR_WORKERS
+
+    with _PIL_EXECUTOR_LOCK:
+        if _PIL_EXECUTOR is not None:
+            _PIL_EXECUTOR.shutdown(wait=True)
+            _PIL_EXECUTOR = None
+            _PIL_EXECUTOR_WORKERS = 0
+
+
+atexit.register(_shutdown_pil_executor)
+
+
+def _image_to_pil(image):
+    if image.dtype != "uint8":
+        image = (image * 255).round().astype("uint8")
+    if image.shape[-1] == 1:
+        # special case for grayscale (single channel) images
+        return Image.fromarray(image.squeeze(), mode="L")
+    return Image.fromarray(image)
+
+
 def numpy_to_pil(images):
     """
-    Convert a numpy image or a batch of images to a PIL image.
+    Convert a numpy image or a batch of images to a PIL image. Float images are expected in `[0, 1]`, `uint8` images
+    are used as is. The images of a batch are converted in a thread pool, numpy and PIL release the GIL while copying
+    the pixels.
     """
+    global _PIL_EXECUTOR, _PIL_EXECUTOR_WORKERS
+
     if images.ndim == 3:
         images = images[None, ...]
-    images = (images * 255).round().astype("uint8")
-    if images.shape[-1] == 1:
-        # special case for grayscale (single channel) images
-        pil_images = [
-            Image.fromarray(
-                image.squeeze(), mode="L") for image in images
-        ]
-    else:
-        pil_images = [Image.fromarray(image) for image in images]
 
-    return pil_images
+    # a single image (or a single core) is converted inline
+    max_workers = min(len(images), os.cpu_count() or 1)
+    if max_workers == 1:
+        return [_image_to_pil(image) for image in images]
+
+    with _PIL_EXECUTOR_LOCK:
+        if _PIL_EXECUTOR is None or _PIL_EXECUTOR_WORKERS < max_workers:
+            if _PIL_EXECUTOR is not None:
+                # the conversions already submitted by other calls still finish
+                _PIL_EXECUTOR.shutdown(wait=False)
+            _PIL_EXECUTOR = ThreadPoolExecutor(max_workers=max_workers)
+            _PIL_EXECUTOR_WORKERS = max_workers
+        futures = [
+            _PIL_EXECUTOR.submit(_image_to_pil, image) for image in images
+        ]
+    return [future.result() for future in futures]
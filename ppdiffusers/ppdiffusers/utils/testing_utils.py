@@ -205,6 +205,14 @@ def require_paddle_gpu(test_case):
                                "test requires Paddle+CUDA")(test_case)
 
 
+def require_paddle_tensorrt(test_case):
+    """Decorator marking a test that requires CUDA and a Paddle build with TensorRT."""
+    return unittest.skipUnless(
+        is_paddle_available() and paddle_device == "gpu" and
+        any(paddle.inference.get_trt_compile_version()),
+        "test requires Paddle+CUDA+TensorRT")(test_case)
+
+
 def require_compel(test_case):
     """
     Decorator marking a test that requires compel: https://github.com/damian0815/compel. These tests are skipped when
@@ -12,8 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import argparse
+import functools
+import gc
+import glob
+import os
+import re
 import tempfile
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import paddle
 import torch
@@ -32,25 +38,106 @@ from ppdiffusers.pipelines.versatile_diffusion import UNetFlatConditionModel
 paddle.set_device("cpu")
 
 
+def prefetch_safetensors(pretrained_model_name_or_path):
+    # diffusers memory maps the safetensors files, the kernel is asked to read the files of a local checkpoint ahead
+    # in parallel so the loading does not fault them in page by page
+    if not os.path.isdir(pretrained_model_name_or_path) or not hasattr(
+            os, "posix_fadvise"):
+        return
+
+    def prefetch(path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
+    paths = glob.glob(
+        os.path.join(pretrained_model_name_or_path, "**", "*.safetensors"),
+        recursive=True)
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        list(executor.map(prefetch, paths))
+
+
+TORCH_DTYPES = {"float32": torch.float32, "float16": torch.float16}
+
+
+def to_numpy(value, dtype="float32", transpose=False):
+    # `detach().numpy()` shares the storage of the torch tensor, so at most one copy is made: the cast is done by the
+    # vectorized torch kernels before the numpy hop and writes the contiguous transpose of a transposed weight in the
+    # same pass, an untransposed weight that already has `dtype` is not copied at all
+    value = value.detach()
+    # the weights are loaded on the cpu, so the device copy is normally skipped
+    if value.device.type != "cpu":
+        value = value.cpu()
+    if transpose:
+        value = value.t()
+    torch_dtype = TORCH_DTYPES[dtype]
+    if value.dtype == torch_dtype:
+        return value.contiguous().numpy()
+    return torch.empty(value.shape, dtype=torch_dtype).copy_(value).numpy()
+
+
+def to_numpy_parallel(items, dtype="float32"):
+    # the copies and casts release the GIL, so the `(key, value, transpose)` items are converted by a pool of threads
+    def convert(item):
+        key, value, transpose = item
+        return key, to_numpy(value, dtype=dtype, transpose=transpose)
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        return OrderedDict(executor.map(convert, items))
+
+
+@functools.lru_cache(maxsize=None)
+def compile_name_mapping(mapping):
+    """
+    Compiles the `(old_name, new_name)` pairs of `mapping` into a single regex that rewrites a name in one pass. The
+    mapped names chain through their dots, e.g. `.mlp.fc1.` is rewritten by both `.mlp.` and `.fc1.`, so the leading
+    and trailing dots that the old and new names share are matched with lookarounds and are never consumed by a match.
+    Both the compiled mapping and the rewritten names are cached, so every sub-model converted with the same mapping
+    reuses them.
+    """
+    patterns = []
+    replacements = {}
+    for old_name, new_name in mapping:
+        lookbehind = old_name.startswith(".") and new_name.startswith(".")
+        if lookbehind:
+            old_name, new_name = old_name[1:], new_name[1:]
+        lookahead = old_name.endswith(".") and new_name.endswith(".")
+        if lookahead:
+            old_name, new_name = old_name[:-1], new_name[:-1]
+        replacements[old_name] = new_name
+        patterns.append(("(?<=\\.)" if lookbehind else "") + re.escape(
+            old_name) + ("(?=\\.)" if lookahead else ""))
+    pattern = re.compile("|".join(patterns))
+
+    @functools.lru_cache(maxsize=None)
+    def rename(name):
+        return pattern.sub(lambda m: replacements[m.group(0)], name)
+
+    return rename
+
+
 def convert_to_ppdiffusers(vae_or_unet, dtype="float32"):
-    need_transpose = []
-    for k, v in vae_or_unet.named_modules():
-        if isinstance(v, torch.nn.Linear):
-            need_transpose.append(k + ".weight")
-    new_vae_or_unet = OrderedDict()
-    for k, v in vae_or_unet.state_dict().items():
-        if k not in need_transpose:
-            new_vae_or_unet[k] = v.cpu().numpy().astype(dtype)
-        else:
-            new_vae_or_unet[k] = v.t().cpu().numpy().astype(dtype)
-    return new_vae_or_unet
+    # the module tree is walked once to find the Linear layers, the keys of the state dict are then checked against
+    # this set in O(1)
+    linear_names = {
+        k
+        for k, v in vae_or_unet.named_modules()
+        if isinstance(v, torch.nn.Linear)
+    }
+    return to_numpy_parallel(
+        [(k, v, k.endswith(".weight") and k[:-len(".weight")] in linear_names)
+         for k, v in vae_or_unet.state_dict().items()],
+        dtype=dtype, )
 
 
 def convert_hf_clip_to_ppnlp_clip(clip,
                                   dtype="float32",
                                   is_text_encoder=True,
-                                  need_prefix=False):
-    new_model_state = {}
+                                  need_prefix=False,
+                                  state_dict=None):
+    items = []
     transformers2ppnlp = {
         ".encoder.": ".transformer.",
         ".layer_norm": ".norm",
@@ -67,28 +154,34 @@ def convert_hf_clip_to_ppnlp_clip(clip,
         ".post_layernorm.": ".ln_post.",
         ".vision_model.": ".",
     }
-    ignore_value = ["position_ids"]
-    donot_transpose = [
-        "embeddings", "norm", "concept_embeds", "special_care_embeds"
-    ]
+    # one C level search per name instead of a generator over the substrings
+    ignore_value = re.compile("position_ids")
+    donot_transpose = re.compile("|".join(
+        map(re.escape, ("embeddings", "norm", "concept_embeds",
+                        "special_care_embeds"))))
+
+    rename = compile_name_mapping(tuple(transformers2ppnlp.items()))
 
-    for name, value in clip.state_dict().items():
+    # `state_dict()` builds a new dict on every call, it is materialized once, an already built one can be passed in
+    if state_dict is None:
+        state_dict = clip.state_dict()
+    for name, value in state_dict.items():
         # step1: ignore position_ids
-        if any(i in name for i in ignore_value):
+        if ignore_value.search(name):
             continue
         # step2: transpose nn.Linear weight
-        if value.ndim == 2 and not any(i in name for i in donot_transpose):
-            value = value.t()
+        transpose = value.ndim == 2 and not donot_transpose.search(name)
         # step3: hf_name -> ppnlp_name mapping
-        for hf_name, ppnlp_name in transformers2ppnlp.items():
-            name = name.replace(hf_name, ppnlp_name)
+        name = rename(name)
         # step4: 0d tensor -> 1d tensor
         if name == "logit_scale":
             value = value.reshape((1, ))
         # step5: safety_checker need prefix "clip."
         if "vision_model" in name and need_prefix:
             name = "clip." + name
-        new_model_state[name] = value.cpu().numpy().astype(dtype)
+        items.append((name, value, transpose))
+    del state_dict
+    new_model_state = to_numpy_parallel(items, dtype=dtype)
 
     if is_text_encoder:
         new_config = {
@@ -132,13 +225,13 @@ def convert_hf_clip_to_ppnlp_clip(clip,
 
 def check_keys(model, state_dict):
     cls_name = model.__class__.__name__
-    missing_keys = []
-    mismatched_keys = []
-    for k, v in model.state_dict().items():
-        if k not in state_dict.keys():
-            missing_keys.append(k)
-        if list(v.shape) != list(state_dict[k].shape):
-            mismatched_keys.append(k)
+    # the state dict of the model is built once, a missing key is not compared by shape
+    model_state_dict = model.state_dict()
+    missing_keys = [k for k in model_state_dict if k not in state_dict]
+    mismatched_keys = [
+        k for k, v in model_state_dict.items()
+        if k in state_dict and list(v.shape) != list(state_dict[k].shape)
+    ]
     if len(missing_keys):
         missing_keys_str = ", ".join(missing_keys)
         print(f"{cls_name} Found missing_keys {missing_keys_str}!")
@@ -147,48 +240,95 @@ def check_keys(model, state_dict):
         print(f"{cls_name} Found mismatched_keys {mismatched_keys_str}!")
 
 
-def convert_diffusers_to_ppdiffusers(pretrained_model_name_or_path,
-                                     output_path=None):
-    # 0. load diffusers pipe and convert to ppdiffusers weights format
-    diffusers_pipe = DiffusersVersatileDiffusionPipeline.from_pretrained(
-        pretrained_model_name_or_path, use_auth_token=True)
-    vae_state_dict = convert_to_ppdiffusers(diffusers_pipe.vae)
-    image_unet_state_dict = convert_to_ppdiffusers(diffusers_pipe.image_unet)
-    text_unet_state_dict = convert_to_ppdiffusers(diffusers_pipe.text_unet)
+def get_numpy_dtype(dtype):
+    # numpy has no bfloat16, these weights are converted in float32 and cast by paddle
+    return "float32" if dtype == "bfloat16" else dtype
 
-    text_encoder_state_dict, text_config = convert_hf_clip_to_ppnlp_clip(
-        diffusers_pipe.text_encoder, is_text_encoder=True, need_prefix=False)
 
-    image_encoder_state_dict, vision_config = convert_hf_clip_to_ppnlp_clip(
-        diffusers_pipe.image_encoder, is_text_encoder=False, need_prefix=False)
+def load_state_dict(model, state_dict, dtype="float32"):
+    # the model is cast to the dtype of the converted weights before loading them, and to `dtype` afterwards
+    model.to(dtype=get_numpy_dtype(dtype))
+    model.set_dict(state_dict)
+    check_keys(model, state_dict)
+    model.to(dtype=dtype)
+
+
+def convert_diffusers_to_ppdiffusers(pretrained_model_name_or_path,
+                                     output_path=None,
+                                     dtype="float32",
+                                     safe_serialization=False,
+                                     skip_existing=False):
+    # the saved pipeline already holds the weights in the ppdiffusers naming and layout, with `skip_existing` a
+    # finished conversion is loaded back from `output_path` instead of converting the diffusers pipe again
+    if skip_existing and output_path is not None and os.path.isfile(
+            os.path.join(output_path,
+                         PPDiffusersVersatileDiffusionPipeline.config_name)):
+        return PPDiffusersVersatileDiffusionPipeline.from_pretrained(
+            output_path)
+
+    # 0. load diffusers pipe, every submodel is converted right before it is loaded into its ppdiffusers counterpart
+    # and its converted weights and torch module are dropped afterwards, so only one converted state dict is alive at a
+    # time
+    # the weights are loaded straight into the float32 modules instead of initializing them first
+    prefetch_safetensors(pretrained_model_name_or_path)
+    diffusers_pipe = DiffusersVersatileDiffusionPipeline.from_pretrained(
+        pretrained_model_name_or_path,
+        use_auth_token=True,
+        low_cpu_mem_usage=True,
+        torch_dtype=torch.float32, )
 
     # 1. vae
+    vae_state_dict = convert_to_ppdiffusers(
+        diffusers_pipe.vae, dtype=get_numpy_dtype(dtype))
     pp_vae = AutoencoderKL.from_config(diffusers_pipe.vae.config)
-
-    pp_vae.set_dict(vae_state_dict)
-    check_keys(pp_vae, vae_state_dict)
+    load_state_dict(pp_vae, vae_state_dict, dtype=dtype)
+    del vae_state_dict
+    diffusers_pipe.vae = None
+    gc.collect()
 
     # 2. image_unet
+    image_unet_state_dict = convert_to_ppdiffusers(
+        diffusers_pipe.image_unet, dtype=get_numpy_dtype(dtype))
     pp_image_unet = UNet2DConditionModel(**diffusers_pipe.image_unet.config)
-    pp_image_unet.set_dict(image_unet_state_dict)
-    check_keys(pp_image_unet, image_unet_state_dict)
+    load_state_dict(pp_image_unet, image_unet_state_dict, dtype=dtype)
+    del image_unet_state_dict
+    diffusers_pipe.image_unet = None
+    gc.collect()
 
     # 3. text_unet
+    text_unet_state_dict = convert_to_ppdiffusers(
+        diffusers_pipe.text_unet, dtype=get_numpy_dtype(dtype))
     pp_text_unet = UNetFlatConditionModel(**diffusers_pipe.text_unet.config)
-    pp_text_unet.set_dict(text_unet_state_dict)
-    check_keys(pp_text_unet, text_unet_state_dict)
+    load_state_dict(pp_text_unet, text_unet_state_dict, dtype=dtype)
+    del text_unet_state_dict
+    diffusers_pipe.text_unet = None
+    gc.collect()
 
     # 4. image_encoder
+    image_encoder_state_dict, vision_config = convert_hf_clip_to_ppnlp_clip(
+        diffusers_pipe.image_encoder,
+        dtype=get_numpy_dtype(dtype),
+        is_text_encoder=False,
+        need_prefix=False, )
     pp_image_encoder = CLIPVisionModelWithProjection(
         CLIPVisionConfig.from_dict(vision_config))
-    pp_image_encoder.set_dict(image_encoder_state_dict)
-    check_keys(pp_image_encoder, image_encoder_state_dict)
+    load_state_dict(pp_image_encoder, image_encoder_state_dict, dtype=dtype)
+    del image_encoder_state_dict
+    diffusers_pipe.image_encoder = None
+    gc.collect()
 
     # 5. text_encoder
+    text_encoder_state_dict, text_config = convert_hf_clip_to_ppnlp_clip(
+        diffusers_pipe.text_encoder,
+        dtype=get_numpy_dtype(dtype),
+        is_text_encoder=True,
+        need_prefix=False, )
     pp_text_encoder = CLIPTextModelWithProjection(
         CLIPTextConfig.from_dict(text_config))
-    pp_text_encoder.set_dict(text_encoder_state_dict)
-    check_keys(pp_text_encoder, text_encoder_state_dict)
+    load_state_dict(pp_text_encoder, text_encoder_state_dict, dtype=dtype)
+    del text_encoder_state_dict
+    diffusers_pipe.text_encoder = None
+    gc.collect()
 
     # 6. scheduler
     beta_start = diffusers_pipe.scheduler.beta_start
@@ -221,24 +361,28 @@ def convert_diffusers_to_ppdiffusers(pretrained_model_name_or_path,
     else:
         raise ValueError(f"Scheduler of type {scheduler_type} doesn't exist!")
 
+    pp_feature_extractor = CLIPFeatureExtractor.from_pretrained(
+        "CompVis/stable-diffusion-v1-4/feature_extractor")
+
+    # 7. tokenizer, the only component that is initialized from its vocab files
     with tempfile.TemporaryDirectory() as tmpdirname:
-        pp_feature_extractor = CLIPFeatureExtractor.from_pretrained(
-            "CompVis/stable-diffusion-v1-4/feature_extractor")
-        # 7. tokenizer
         diffusers_pipe.tokenizer.save_pretrained(tmpdirname)
         pp_tokenizer = CLIPTokenizer.from_pretrained(tmpdirname)
-        # 8. create ppdiffusers pipe
-        paddle_pipe = PPDiffusersVersatileDiffusionPipeline(
-            tokenizer=pp_tokenizer,
-            image_feature_extractor=pp_feature_extractor,
-            text_encoder=pp_text_encoder,
-            image_encoder=pp_image_encoder,
-            image_unet=pp_image_unet,
-            text_unet=pp_text_unet,
-            vae=pp_vae,
-            scheduler=pp_scheduler, )
-        # 9. save_pretrained
-        paddle_pipe.save_pretrained(output_path)
+
+    # 8. create ppdiffusers pipe
+    paddle_pipe = PPDiffusersVersatileDiffusionPipeline(
+        tokenizer=pp_tokenizer,
+        image_feature_extractor=pp_feature_extractor,
+        text_encoder=pp_text_encoder,
+        image_encoder=pp_image_encoder,
+        image_unet=pp_image_unet,
+        text_unet=pp_text_unet,
+        vae=pp_vae,
+        scheduler=pp_scheduler, )
+
+    # 9. save_pretrained
+    paddle_pipe.save_pretrained(
+        output_path, safe_serialization=safe_serialization)
     return paddle_pipe
 
 
@@ -256,6 +400,26 @@ if __name__ == "__main__":
         type=str,
         default="versatile-diffusion-ppdiffusers",
         help="The model output path.", )
+    parser.add_argument(
+        "--dtype",
+        type=str,
+        default="float32",
+        choices=["float32", "float16", "bfloat16"],
+        help="The dtype of the converted weights.", )
+    parser.add_argument(
+        "--safe_serialization",
+        action="store_true",
+        help="Whether to save the weights with `safetensors`, which writes every tensor from a single buffer instead of pickling it.",
+    )
+    parser.add_argument(
+        "--skip_existing",
+        action="store_true",
+        help="Whether to load the pipeline from `output_path` instead of converting it again when it was already converted.",
+    )
     args = parser.parse_args()
     ppdiffusers_pipe = convert_diffusers_to_ppdiffusers(
-        args.pretrained_model_name_or_path, args.output_path)
+        args.pretrained_model_name_or_path,
+        args.output_path,
+        dtype=args.dtype,
+        safe_serialization=args.safe_serialization,
+        skip_existing=args.skip_existing, )
@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import tempfile
 import unittest
 
 import paddle
@@ -90,3 +92,63 @@ class AttnAddedKVProcessorTests(unittest.TestCase):
         only_cross_attn_out = attn(**forward_args)
 
         self.assertTrue((only_cross_attn_out != self_and_cross_attn_out).all())
+
+    def test_fuse_projections(self):
+        paddle.seed(0)
+
+        constructor_args = self.get_constructor_arguments(
+            only_cross_attention=False)
+        attn = Attention(**constructor_args)
+        attn.eval()
+
+        forward_args = self.get_forward_arguments(
+            query_dim=constructor_args["query_dim"],
+            added_kv_proj_dim=constructor_args["added_kv_proj_dim"], )
+
+        out = attn(**forward_args)
+
+        attn.fuse_projections()
+        self.assertTrue(attn.fused_projections)
+        fused_out = attn(**forward_args)
+        self.assertTrue(paddle.allclose(out, fused_out, atol=1e-5).item())
+
+        attn.unfuse_projections()
+        self.assertFalse(attn.fused_projections)
+        self.assertFalse(hasattr(attn, "qkv_weight"))
+        self.assertNotIn("qkv_weight", attn.state_dict())
+
+    def test_fuse_projections_save_load(self):
+        paddle.seed(0)
+
+        constructor_args = self.get_constructor_arguments(
+            only_cross_attention=False)
+        attn = Attention(**constructor_args)
+        attn.eval()
+        state_dict_keys = set(attn.state_dict().keys())
+
+        forward_args = self.get_forward_arguments(
+            query_dim=constructor_args["query_dim"],
+            added_kv_proj_dim=constructor_args["added_kv_proj_dim"], )
+
+        # the fused weights are left out of the state dict, a fused layer saves the same checkpoint as an unfused one
+        attn.fuse_projections()
+        fused_out = attn(**forward_args)
+        state_dict = attn.state_dict()
+        self.assertEqual(set(state_dict.keys()), state_dict_keys)
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            path = os.path.join(tmpdirname, "attn.pdparams")
+            paddle.save(state_dict, path)
+
+            paddle.seed(1)
+            new_attn = Attention(**constructor_args)
+            new_attn.eval()
+            new_attn.set_state_dict(paddle.load(path))
+
+        out = new_attn(**forward_args)
+        self.assertTrue(paddle.allclose(out, fused_out, atol=1e-5).item())
+
+        new_attn.fuse_projections()
+        new_fused_out = new_attn(**forward_args)
+        self.assertTrue(
+            paddle.allclose(new_fused_out, fused_out, atol=1e-5).item())
@@ -85,6 +85,45 @@ class DanceDiffusionPipelineFastTests(PipelineTesterMixin, unittest.TestCase):
             [1.0, 1.0, 0.9972942, -0.4477799, -0.5952974, 1.0])
         assert np.abs(audio_slice.flatten() - expected_slice).max() < 0.01
 
+    def test_dance_diffusion_chunk_size(self):
+        components = self.get_dummy_components()
+        pipe = DanceDiffusionPipeline(**components)
+        pipe.set_progress_bar_config(disable=None)
+        inputs = self.get_dummy_inputs()
+        inputs["batch_size"] = 3
+        audio = pipe(**inputs).audios
+
+        inputs = self.get_dummy_inputs()
+        inputs["batch_size"] = 3
+        inputs["chunk_size"] = 2
+        audio_chunked = pipe(**inputs).audios
+        assert audio_chunked.shape == audio.shape
+        assert np.abs(audio_chunked - audio).max() < 1e-4
+
+    def test_dance_diffusion_freeze_shapes_chunk_size(self):
+        components = self.get_dummy_components()
+        pipe = DanceDiffusionPipeline(**components)
+        pipe.set_progress_bar_config(disable=None)
+        inputs = self.get_dummy_inputs()
+        inputs["batch_size"] = 4
+        audio = pipe(**inputs).audios
+
+        # the frozen shape is the one of every chunk fed to the unet
+        pipe.freeze_shapes(batch_size=2)
+        inputs = self.get_dummy_inputs()
+        inputs["batch_size"] = 4
+        inputs["chunk_size"] = 2
+        audio_frozen = pipe(**inputs).audios
+        assert audio_frozen.shape == audio.shape
+        assert np.abs(audio_frozen - audio).max() < 1e-3
+
+        # the last chunk of 3 samples only holds a single one
+        inputs = self.get_dummy_inputs()
+        inputs["batch_size"] = 3
+        inputs["chunk_size"] = 2
+        with self.assertRaises(ValueError):
+            pipe(**inputs)
+
 
 @slow
 @require_paddle_gpu
@@ -19,6 +19,7 @@ import numpy as np
 import paddle
 
 from ppdiffusers import PNDMPipeline, PNDMScheduler, UNet2DModel
+from ppdiffusers.utils import randn_tensor
 from ppdiffusers.utils.testing_utils import require_paddle, slow
 
 
@@ -59,6 +60,80 @@ class PNDMPipelineFastTests(unittest.TestCase):
         assert np.abs(image_from_tuple_slice.flatten() - expected_slice).max(
         ) < 0.01
 
+    def test_inference_compile_model(self):
+        unet = self.dummy_uncond_unet
+        scheduler = PNDMScheduler()
+        pndm = PNDMPipeline(unet=unet, scheduler=scheduler)
+        pndm.set_progress_bar_config(disable=None)
+        generator = paddle.Generator().manual_seed(0)
+        image = pndm(
+            generator=generator, num_inference_steps=20,
+            output_type="numpy").images
+
+        pndm_compiled = PNDMPipeline(
+            unet=self.dummy_uncond_unet,
+            scheduler=scheduler,
+            compile_model=True)
+        pndm_compiled.set_progress_bar_config(disable=None)
+        generator = paddle.Generator().manual_seed(0)
+        image_compiled = pndm_compiled(
+            generator=generator, num_inference_steps=20,
+            output_type="numpy").images
+        assert image_compiled.shape == (1, 32, 32, 3)
+        assert np.abs(image - image_compiled).max() < 1e-3
+
+    def test_inference_freeze_shapes(self):
+        pndm = PNDMPipeline(
+            unet=self.dummy_uncond_unet, scheduler=PNDMScheduler())
+        pndm.set_progress_bar_config(disable=None)
+        generator = paddle.Generator().manual_seed(0)
+        image = pndm(
+            generator=generator, num_inference_steps=20,
+            output_type="numpy").images
+
+        for compile_model in [False, True]:
+            pndm_frozen = PNDMPipeline(
+                unet=self.dummy_uncond_unet,
+                scheduler=PNDMScheduler(),
+                compile_model=compile_model)
+            pndm_frozen.set_progress_bar_config(disable=None)
+            # freezing leaves the schedule of the scheduler alone
+            pndm_frozen.scheduler.set_timesteps(3)
+            timesteps = pndm_frozen.scheduler.timesteps.numpy()
+            pndm_frozen.freeze_shapes(batch_size=1)
+            assert (pndm_frozen.scheduler.timesteps.numpy() == timesteps).all()
+            generator = paddle.Generator().manual_seed(0)
+            image_frozen = pndm_frozen(
+                generator=generator,
+                num_inference_steps=20,
+                output_type="numpy").images
+            assert image_frozen.shape == (1, 32, 32, 3)
+            assert np.abs(image - image_frozen).max() < 1e-3
+
+            with self.assertRaises(ValueError):
+                pndm_frozen(batch_size=2, num_inference_steps=2)
+
+    def test_prepare_noise(self):
+        pndm = PNDMPipeline(
+            unet=self.dummy_uncond_unet, scheduler=PNDMScheduler())
+        shape = (1, 3, 32, 32)
+
+        generator = paddle.Generator().manual_seed(0)
+        noise = pndm.prepare_noise(shape, generator=generator)
+        generator = paddle.Generator().manual_seed(0)
+        expected = randn_tensor(shape, generator=generator)
+        assert np.abs((noise - expected).numpy()).max() == 0
+
+        # every call returns a new tensor, the noise of an earlier call is left untouched
+        noise_copy = noise.clone()
+        generator = paddle.Generator().manual_seed(1)
+        pndm.prepare_noise(shape, generator=generator)
+        assert np.abs((noise - noise_copy).numpy()).max() == 0
+
+        generator = paddle.Generator().manual_seed(0)
+        scaled = pndm.prepare_noise(shape, generator=generator, std=2.0)
+        assert np.abs((scaled - 2.0 * expected).numpy()).max() < 1e-6
+
 
 @slow
 @require_paddle
@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
 import gc
 import unittest
 
@@ -25,18 +26,31 @@ from ppdiffusers import (AutoencoderKL, DDIMScheduler,
                          PNDMScheduler, StableDiffusionPanoramaPipeline,
                          UNet2DConditionModel)
 from ppdiffusers.utils import slow
-from ppdiffusers.utils.testing_utils import require_paddle_gpu
+from ppdiffusers.utils.testing_utils import (parse_flag_from_env,
+                                             require_paddle_gpu)
 
 from ..pipeline_params import TEXT_TO_IMAGE_BATCH_PARAMS, TEXT_TO_IMAGE_PARAMS
 from ..test_pipelines_common import PipelineTesterMixin
 
 
+def slice_close(image_slice, expected_slice, tol=0.01):
+    return np.allclose(image_slice.ravel(), expected_slice, atol=tol, rtol=0)
+
+
 class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
                                                unittest.TestCase):
     pipeline_class = StableDiffusionPanoramaPipeline
     params = TEXT_TO_IMAGE_PARAMS
     batch_params = TEXT_TO_IMAGE_BATCH_PARAMS
 
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the tokenizer is stateless and is loaded once, the models are still built per call since the common tests
+        # cast them to float16 or change their attention processors in place
+        cls.tokenizer = CLIPTokenizer.from_pretrained(
+            "hf-internal-testing/tiny-random-clip")
+
     def get_dummy_components(self):
         paddle.seed(0)
         unet = UNet2DConditionModel(
@@ -69,8 +83,7 @@ class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
             pad_token_id=1,
             vocab_size=1000, )
         text_encoder = CLIPTextModel(text_encoder_config).eval()
-        tokenizer = CLIPTokenizer.from_pretrained(
-            "hf-internal-testing/tiny-random-clip")
+        tokenizer = self.tokenizer
         components = {
             "unet": unet,
             "scheduler": scheduler,
@@ -114,15 +127,18 @@ class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
             0.30616608,
             0.4785265,
         ])
-        assert np.abs(image_slice.flatten() - expected_slice).max() < 0.01
+        assert slice_close(image_slice, expected_slice)
 
-    # override to speed the overall test timing up.
+    # override to speed the overall test timing up, only the batch size of the outputs is checked, so the latents are
+    # returned without decoding them.
     def test_inference_batch_consistent(self):
-        super().test_inference_batch_consistent(batch_sizes=[1, 2])
+        self._test_inference_batch_consistent(
+            batch_sizes=[1, 2], output_types=["latent"])
 
     # override to speed the overall test timing up.
     def test_inference_batch_single_identical(self):
-        super().test_inference_batch_single_identical(batch_size=2)
+        self._test_inference_batch_single_identical(
+            batch_size=2, output_type="latent")
 
     def test_stable_diffusion_panorama_negative_prompt(self):
         components = self.get_dummy_components()
@@ -145,7 +161,7 @@ class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
             0.3066897,
             0.47881347,
         ])
-        assert np.abs(image_slice.flatten() - expected_slice).max() < 0.01
+        assert slice_close(image_slice, expected_slice)
 
     def test_stable_diffusion_panorama_euler(self):
         components = self.get_dummy_components()
@@ -168,7 +184,7 @@ class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
             0.14128971,
             0.32650158,
         ])
-        assert np.abs(image_slice.flatten() - expected_slice).max() < 0.01
+        assert slice_close(image_slice, expected_slice)
 
     def test_stable_diffusion_panorama_pndm(self):
         components = self.get_dummy_components()
@@ -183,8 +199,33 @@ class StableDiffusionPanoramaPipelineFastTests(PipelineTesterMixin,
 @slow
 @require_paddle_gpu
 class StableDiffusionPanoramaSlowTests(unittest.TestCase):
-    def tearDown(self):
-        super().tearDown()
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # the pipeline is loaded and its unet converted to a static graph once, the graph is built by a warmup run
+        # so the tests only replay it, every test builds its scheduler from the original config
+        model_ckpt = "stabilityai/stable-diffusion-2-base"
+        scheduler = DDIMScheduler.from_pretrained(
+            model_ckpt, subfolder="scheduler")
+        cls.pipe = StableDiffusionPanoramaPipeline.from_pretrained(
+            model_ckpt, scheduler=scheduler, safety_checker=None)
+        cls.pipe.set_progress_bar_config(disable=None)
+        # with RUN_CUDA_GRAPH=yes the unet forward of every view is replayed from a captured CUDA graph instead, the
+        # static graph stays the default since it is easier to debug
+        if parse_flag_from_env("RUN_CUDA_GRAPH", default=False):
+            cls.pipe.enable_cuda_graph()
+        else:
+            cls.pipe.unet = cls.pipe.compile_module(cls.pipe.unet)
+        cls.scheduler_config = scheduler.config
+        cls.pipe(
+            "a photo of the dolomites",
+            num_inference_steps=1,
+            output_type="numpy", )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        del cls.pipe
         gc.collect()
         paddle.device.cuda.empty_cache()
 
@@ -200,13 +241,9 @@ class StableDiffusionPanoramaSlowTests(unittest.TestCase):
         return inputs
 
     def test_stable_diffusion_panorama_default(self):
-        model_ckpt = "stabilityai/stable-diffusion-2-base"
-        scheduler = DDIMScheduler.from_pretrained(
-            model_ckpt, subfolder="scheduler")
-        pipe = StableDiffusionPanoramaPipeline.from_pretrained(
-            model_ckpt, scheduler=scheduler, safety_checker=None)
-        pipe.set_progress_bar_config(disable=None)
-        pipe.enable_attention_slicing()
+        # a shallow copy shares the loaded models, the scheduler set on it does not replace the one of the class
+        pipe = copy.copy(self.pipe)
+        pipe.scheduler = DDIMScheduler.from_config(self.scheduler_config)
         inputs = self.get_inputs()
         image = pipe(**inputs).images
         image_slice = image[0, -3:, -3:, -1].flatten()
@@ -222,14 +259,12 @@ class StableDiffusionPanoramaSlowTests(unittest.TestCase):
             0.32646674,
             0.32534528,
         ])
-        assert np.abs(expected_slice - image_slice).max() < 0.01
+        assert slice_close(image_slice, expected_slice)
 
     def test_stable_diffusion_panorama_k_lms(self):
-        pipe = StableDiffusionPanoramaPipeline.from_pretrained(
-            "stabilityai/stable-diffusion-2-base", safety_checker=None)
-        pipe.scheduler = LMSDiscreteScheduler.from_config(pipe.scheduler.config)
-        pipe.set_progress_bar_config(disable=None)
-        pipe.enable_attention_slicing()
+        pipe = copy.copy(self.pipe)
+        pipe.scheduler = LMSDiscreteScheduler.from_config(
+            self.scheduler_config)
         inputs = self.get_inputs()
         image = pipe(**inputs).images
         image_slice = image[0, -3:, -3:, -1].flatten()
@@ -245,7 +280,7 @@ class StableDiffusionPanoramaSlowTests(unittest.TestCase):
             0.0,
             0.02607787,
         ])
-        assert np.abs(expected_slice - image_slice).max() < 0.01
+        assert slice_close(image_slice, expected_slice)
 
     def test_stable_diffusion_panorama_intermediate_state(self):
         number_of_steps = 0
@@ -270,8 +305,7 @@ class StableDiffusionPanoramaSlowTests(unittest.TestCase):
                     -0.20892930030822754,
                     -0.157355397939682,
                 ])
-                assert np.abs(latents_slice.flatten() - expected_slice).max(
-                ) < 0.05
+                assert slice_close(latents_slice, expected_slice, tol=0.05)
             elif step == 2:
                 latents = latents.detach().cpu().numpy()
                 assert latents.shape == (1, 4, 64, 256)
@@ -287,17 +321,11 @@ class StableDiffusionPanoramaSlowTests(unittest.TestCase):
                     -0.20782311260700226,
                     -0.15696658194065094,
                 ])
-                assert np.abs(latents_slice.flatten() - expected_slice).max(
-                ) < 0.05
+                assert slice_close(latents_slice, expected_slice, tol=0.05)
 
         callback_fn.has_been_called = False
-        model_ckpt = "stabilityai/stable-diffusion-2-base"
-        scheduler = DDIMScheduler.from_pretrained(
-            model_ckpt, subfolder="scheduler")
-        pipe = StableDiffusionPanoramaPipeline.from_pretrained(
-            model_ckpt, scheduler=scheduler, safety_checker=None)
-        pipe.set_progress_bar_config(disable=None)
-        pipe.enable_attention_slicing()
+        pipe = copy.copy(self.pipe)
+        pipe.scheduler = DDIMScheduler.from_config(self.scheduler_config)
         inputs = self.get_inputs()
         pipe(**inputs, callback=callback_fn, callback_steps=1)
         assert callback_fn.has_been_called
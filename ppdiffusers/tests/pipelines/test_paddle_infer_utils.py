@@ -0,0 +1,215 @@
+# Copyright (c) 2023 PaddlePaddle Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import paddle
+
+from ppdiffusers import UNet2DModel, VQModel
+from ppdiffusers.pipelines.paddle_infer_utils import (
+    TRT_CALIB_TABLE_PREFIX, _has_calibration_table, bind_trt_engine,
+    bind_vqvae_decoder_engine, build_trt_engine, build_vqvae_decoder_engine,
+    export_unet)
+from ppdiffusers.utils import FASTDEPLOY_MODEL_NAME
+from ppdiffusers.utils.testing_utils import require_paddle_tensorrt
+
+
+class _FakeHandle:
+    def __init__(self):
+        self.value = None
+        self.shared = False
+
+    def copy_from_cpu(self, array):
+        self.value = paddle.to_tensor(array)
+
+    def share_external_data(self, tensor):
+        self.value = tensor
+        self.shared = True
+
+    def copy_to_cpu(self):
+        return self.value.numpy()
+
+
+class _FakePredictor:
+    """
+    Stand-in for a `paddle.inference.Predictor` that runs `fn` eagerly on the bound inputs.
+    """
+
+    def __init__(self, fn, input_names):
+        self.fn = fn
+        self.input_names = input_names
+        self.input_handles = {name: _FakeHandle() for name in input_names}
+        self.output_handle = _FakeHandle()
+        self.num_runs = 0
+
+    def get_input_names(self):
+        return self.input_names
+
+    def get_input_handle(self, name):
+        return self.input_handles[name]
+
+    def get_output_names(self):
+        return ["output"]
+
+    def get_output_handle(self, name):
+        return self.output_handle
+
+    def run(self):
+        self.num_runs += 1
+        output = self.fn(
+            *[self.input_handles[name].value for name in self.input_names])
+        if self.output_handle.shared:
+            paddle.assign(output, output=self.output_handle.value)
+        else:
+            self.output_handle.value = output
+
+
+def get_dummy_uncond_unet():
+    paddle.seed(0)
+    model = UNet2DModel(
+        block_out_channels=(32, 64),
+        layers_per_block=2,
+        sample_size=32,
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownBlock2D", "AttnDownBlock2D"),
+        up_block_types=("AttnUpBlock2D", "UpBlock2D"), )
+    return model.eval()
+
+
+def get_dummy_vq_model():
+    paddle.seed(0)
+    model = VQModel(
+        block_out_channels=[32, 64],
+        in_channels=3,
+        out_channels=3,
+        down_block_types=["DownEncoderBlock2D", "DownEncoderBlock2D"],
+        up_block_types=["UpDecoderBlock2D", "UpDecoderBlock2D"],
+        latent_channels=3, )
+    return model.eval()
+
+
+class PaddleInferUtilsFastTests(unittest.TestCase):
+
+    def test_has_calibration_table(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            self.assertFalse(
+                _has_calibration_table(os.path.join(tmpdirname, "missing")))
+            open(os.path.join(tmpdirname, "calibration_notes.txt"),
+                 "w").close()
+            self.assertFalse(_has_calibration_table(tmpdirname))
+            open(
+                os.path.join(tmpdirname, TRT_CALIB_TABLE_PREFIX + "1234"),
+                "w").close()
+            self.assertTrue(_has_calibration_table(tmpdirname))
+
+    def test_int8_engine_requires_calibration_loader(self):
+        unet = get_dummy_uncond_unet()
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            with self.assertRaises(ValueError):
+                build_trt_engine(
+                    unet, (1, 3, 32, 32), tmpdirname, precision="int8")
+
+    def test_export_unet(self):
+        unet = get_dummy_uncond_unet()
+        sample = paddle.randn([2, 3, 32, 32])
+        timestep = paddle.to_tensor([10.0])
+        with paddle.no_grad():
+            expected = unet(sample, timestep).sample
+
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            export_unet(unet, tmpdirname, (1, 3, 32, 32))
+            self.assertTrue(
+                os.path.exists(os.path.join(tmpdirname, FASTDEPLOY_MODEL_NAME)))
+            exported = paddle.jit.load(
+                os.path.join(tmpdirname, FASTDEPLOY_MODEL_NAME.rsplit(".",
+                                                                      1)[0]))
+            # the batch dimension is exported as dynamic
+            output = exported(sample, timestep)
+        self.assertLess(np.abs((output - expected).numpy()).max(), 1e-4)
+
+    def test_bind_trt_engine(self):
+        unet = get_dummy_uncond_unet()
+        sample = paddle.randn([2, 3, 32, 32])
+        eager_forward = unet.forward
+        with paddle.no_grad():
+            expected = unet(sample, 10).sample
+            predictor = _FakePredictor(
+                lambda sample, timestep: eager_forward(sample, timestep).sample,
+                ["sample", "timestep"])
+            bind_trt_engine(unet, predictor)
+            output = unet(sample, 10).sample
+            output_tuple = unet(sample, 10, return_dict=False)[0]
+        self.assertEqual(predictor.num_runs, 2)
+        self.assertLess(np.abs((output - expected).numpy()).max(), 1e-5)
+        self.assertLess(np.abs((output_tuple - expected).numpy()).max(), 1e-5)
+
+        # the engine has no class label input, the labels are rejected instead of silently dropped
+        with self.assertRaises(ValueError):
+            unet(sample, 10, class_labels=paddle.to_tensor([0, 1]))
+
+    def test_bind_vqvae_decoder_engine(self):
+        vqvae = get_dummy_vq_model()
+        latents = paddle.randn([1, 3, 16, 16])
+        other_latents = paddle.randn([2, 3, 16, 16])
+        eager_decode = vqvae.decode
+        with paddle.no_grad():
+            expected = vqvae.decode(latents).sample
+            expected_other = vqvae.decode(other_latents).sample
+            predictor = _FakePredictor(
+                lambda latents: eager_decode(latents).sample, ["latents"])
+            bind_vqvae_decoder_engine(
+                vqvae, predictor, latent_shape=(1, 3, 16, 16))
+            output = vqvae.decode(latents).sample
+            # latents of another shape than the static engine shape are decoded eagerly
+            output_other = vqvae.decode(other_latents).sample
+        self.assertEqual(predictor.num_runs, 1)
+        self.assertEqual(output.shape, expected.shape)
+        self.assertLess(np.abs((output - expected).numpy()).max(), 1e-5)
+        self.assertLess(
+            np.abs((output_other - expected_other).numpy()).max(), 1e-5)
+
+
+@require_paddle_tensorrt
+class PaddleInferUtilsTensorRTTests(unittest.TestCase):
+    def test_trt_engine_matches_eager(self):
+        unet = get_dummy_uncond_unet()
+        sample = paddle.randn([1, 3, 32, 32])
+        with paddle.no_grad():
+            expected = unet(sample, 10).sample
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            predictor = build_trt_engine(
+                unet, (1, 3, 32, 32), tmpdirname, precision="float32")
+            bind_trt_engine(unet, predictor)
+            first = unet(sample, 10).sample
+            second = unet(sample, 10).sample
+        self.assertLess(np.abs((first - expected).numpy()).max(), 1e-3)
+        # the output buffer is fresh every step, so earlier outputs are not overwritten
+        self.assertLess(np.abs((first - second).numpy()).max(), 1e-5)
+
+    def test_vqvae_decoder_engine_matches_eager(self):
+        vqvae = get_dummy_vq_model()
+        latents = paddle.randn([1, 3, 16, 16])
+        with paddle.no_grad():
+            expected = vqvae.decode(latents).sample
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            predictor = build_vqvae_decoder_engine(
+                vqvae, (1, 3, 16, 16), tmpdirname, precision="float32")
+            bind_vqvae_decoder_engine(
+                vqvae, predictor, latent_shape=(1, 3, 16, 16))
+            output = vqvae.decode(latents).sample
+        self.assertLess(np.abs((output - expected).numpy()).max(), 1e-3)
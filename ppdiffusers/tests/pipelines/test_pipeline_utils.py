@@ -15,7 +15,12 @@
 
 import unittest
 
-from ppdiffusers.pipelines.pipeline_utils import is_safetensors_compatible
+import paddle
+
+from ppdiffusers import UNet2DModel
+from ppdiffusers.pipelines.pipeline_utils import (CUDAGraphRunner,
+                                                  is_safetensors_compatible)
+from ppdiffusers.utils.testing_utils import require_paddle_gpu
 
 
 class IsSafetensorsCompatibleTests(unittest.TestCase):
@@ -147,3 +152,68 @@ class IsSafetensorsCompatibleTests(unittest.TestCase):
         ]
         variant = "fp16"
         self.assertFalse(is_safetensors_compatible(filenames, variant=variant))
+
+
+@require_paddle_gpu
+class CUDAGraphRunnerTests(unittest.TestCase):
+    def setUp(self):
+        from paddle.device.cuda.graphs import is_cuda_graph_supported
+
+        if not is_cuda_graph_supported():
+            self.skipTest("CUDA graphs are not supported by this paddle build")
+
+    def get_dummy_unet(self):
+        paddle.seed(0)
+        unet = UNet2DModel(
+            block_out_channels=(32, 64),
+            layers_per_block=2,
+            sample_size=32,
+            in_channels=3,
+            out_channels=3,
+            down_block_types=("DownBlock2D", "AttnDownBlock2D"),
+            up_block_types=("AttnUpBlock2D", "UpBlock2D"), )
+        unet.eval()
+        return unet
+
+    def test_replay_matches_eager(self):
+        unet = self.get_dummy_unet()
+        runner = CUDAGraphRunner(unet)
+        unet.forward = runner
+
+        # two steps with different inputs, the second one replays the graph captured by the first one
+        for step, t in enumerate([10, 5]):
+            sample = paddle.randn([1, 3, 32, 32])
+            timestep = paddle.to_tensor([t])
+            expected = runner.eager_forward(sample, timestep).sample
+            output = unet(sample, timestep).sample
+            self.assertFalse(runner.failed)
+            self.assertEqual(len(runner.graphs), 1)
+            self.assertTrue(
+                paddle.allclose(output, expected, atol=1e-4).item(),
+                f"replay of step {step} differs from the eager forward")
+
+        # a new batch size does not match the captured signature and is captured separately
+        sample = paddle.randn([2, 3, 32, 32])
+        timestep = paddle.to_tensor([5, 5])
+        expected = runner.eager_forward(sample, timestep).sample
+        output = unet(sample, timestep).sample
+        self.assertFalse(runner.failed)
+        self.assertEqual(len(runner.graphs), 2)
+        self.assertTrue(paddle.allclose(output, expected, atol=1e-4).item())
+
+        runner.reset()
+        self.assertEqual(runner.graphs, {})
+
+    def test_scalar_timestep_replays(self):
+        unet = self.get_dummy_unet()
+        runner = CUDAGraphRunner(unet)
+        unet.forward = runner
+
+        # a python timestep is passed as a tensor, the steps share one graph instead of capturing one each
+        for t in [10, 5]:
+            sample = paddle.randn([1, 3, 32, 32])
+            expected = runner.eager_forward(sample, t).sample
+            output = unet(sample, t).sample
+            self.assertEqual(len(runner.graphs), 1)
+            self.assertTrue(
+                paddle.allclose(output, expected, atol=1e-4).item())
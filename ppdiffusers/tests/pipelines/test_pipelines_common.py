@@ -178,7 +178,8 @@ class PipelineTesterMixin:
     def _test_inference_batch_consistent(
             self,
             batch_sizes=[2, 4, 13],
-            additional_params_copy_to_batched_inputs=["num_inference_steps"], ):
+            additional_params_copy_to_batched_inputs=["num_inference_steps"],
+            output_types=[None, "np"], ):
         components = self.get_dummy_components()
         pipe = self.pipeline_class(**components)
         pipe.set_progress_bar_config(disable=None)
@@ -204,16 +205,12 @@ class PipelineTesterMixin:
                     batched_inputs[name] = value
             for arg in additional_params_copy_to_batched_inputs:
                 batched_inputs[arg] = inputs[arg]
-            batched_inputs["output_type"] = None
-            if self.pipeline_class.__name__ == "DanceDiffusionPipeline":
-                batched_inputs.pop("output_type")
-            output = pipe(**batched_inputs)
-            assert len(output[0]) == batch_size
-            batched_inputs["output_type"] = "np"
-            if self.pipeline_class.__name__ == "DanceDiffusionPipeline":
-                batched_inputs.pop("output_type")
-            output = pipe(**batched_inputs)[0]
-            assert output.shape[0] == batch_size
+            for output_type in output_types:
+                batched_inputs["output_type"] = output_type
+                if self.pipeline_class.__name__ == "DanceDiffusionPipeline":
+                    batched_inputs.pop("output_type")
+                output = pipe(**batched_inputs)[0]
+                assert len(output) == batch_size
         logger.setLevel(level=ppdiffusers.logging.WARNING)
 
     def test_inference_batch_single_identical(self, batch_size=3):
@@ -226,7 +223,8 @@ class PipelineTesterMixin:
             test_mean_pixel_difference=None,
             relax_max_difference=False,
             expected_max_diff=1e-4,
-            additional_params_copy_to_batched_inputs=["num_inference_steps"], ):
+            additional_params_copy_to_batched_inputs=["num_inference_steps"],
+            output_type=None, ):
 
         components = self.get_dummy_components()
         pipe = self.pipeline_class(**components)
@@ -259,7 +257,9 @@ class PipelineTesterMixin:
         for arg in additional_params_copy_to_batched_inputs:
             batched_inputs[arg] = inputs[arg]
         if self.pipeline_class.__name__ != "DanceDiffusionPipeline":
-            batched_inputs["output_type"] = "np"
+            batched_inputs["output_type"] = output_type or "np"
+        if output_type is not None:
+            inputs["output_type"] = output_type
         output_batch = pipe(**batched_inputs)
         assert output_batch[0].shape[0] == batch_size
         inputs["generator"] = self.get_generator(0)
@@ -323,6 +323,37 @@ class UnCLIPPipelineFastTests(PipelineTesterMixin, unittest.TestCase):
             output_type="np", )[0]
         assert np.abs(image - image_from_text).max() < 0.0001
 
+    def test_unclip_uncond_cache_invalidation(self):
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        pipe.set_progress_bar_config(disable=None)
+        pipe(**self.get_dummy_inputs())
+        assert len(pipe._uncond_cache) == 1
+
+        # replacing the text encoder drops the embeddings computed with the previous one
+        pipe.text_encoder = self.dummy_text_encoder
+        assert len(pipe._uncond_cache) == 0
+        pipe(**self.get_dummy_inputs())
+        assert len(pipe._uncond_cache) == 1
+
+        pipe.clear_cache()
+        assert len(pipe._uncond_cache) == 0
+
+    def test_unclip_timesteps_cache(self):
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        for num_steps in range(1, pipe._max_sched_cache_size + 3):
+            pipe._get_timesteps(num_steps, 2)
+        # the oldest combinations are dropped once the cache is full
+        assert len(pipe._sched_cache) == pipe._max_sched_cache_size
+        assert (1, 2) not in pipe._sched_cache
+
+        pipe.decoder_scheduler = UnCLIPScheduler.from_config(
+            pipe.decoder_scheduler.config)
+        assert len(pipe._sched_cache) == 0
+        decoder_timesteps, _ = pipe._get_timesteps(3, 2)
+        assert decoder_timesteps is pipe.decoder_scheduler.timesteps
+
     def test_attention_slicing_forward_pass(self):
         test_max_difference = False
         self._test_attention_slicing_forward_pass(
@@ -352,6 +352,19 @@ class UnCLIPImageVariationPipelineFastTests(PipelineTesterMixin,
             image_embeddings=image_embeddings, ).images
         assert np.abs(img_out_1 - img_out_2).max() < 0.0001
 
+    def test_unclip_passed_image_embed_batch_mismatch(self):
+        components = self.get_dummy_components()
+        pipe = self.pipeline_class(**components)
+        pipe.set_progress_bar_config(disable=None)
+        pipeline_inputs = self.get_dummy_inputs(pil_image=False)
+        image_embeddings = pipe.image_encoder(
+            pipeline_inputs["image"]).image_embeds
+        with self.assertRaises(ValueError):
+            pipe(
+                **pipeline_inputs,
+                image_embeddings=paddle.concat(
+                    [image_embeddings, image_embeddings]), )
+
     def test_attention_slicing_forward_pass(self):
         test_max_difference = False
         # Check is relaxed because there is not a torch 2.0 sliced attention added kv processor
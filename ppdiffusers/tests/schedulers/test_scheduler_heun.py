@@ -150,3 +150,30 @@ class HeunDiscreteSchedulerTest(SchedulerCommonTest):
 
         assert abs(result_sum.item() - 0.00015) < 1e-2
         assert abs(result_mean.item() - 1.9869554535034695e-07) < 1e-2
+
+    def test_add_noise_occurrence_rules(self):
+        scheduler_class = self.scheduler_classes[0]
+        scheduler = scheduler_class(**self.get_scheduler_config())
+        scheduler.set_timesteps(self.num_inference_steps)
+
+        # a schedule whose repeated timestep maps to two different sigmas, so both occurrence rules are observable
+        scheduler.timesteps = paddle.to_tensor([3.0, 2.0, 2.0, 1.0])
+        scheduler.sigmas = paddle.to_tensor([4.0, 3.0, 2.0, 1.0])
+        scheduler._sigmas_by_dtype = {}
+
+        original_samples = paddle.zeros([2, 1])
+        noise = paddle.ones([2, 1])
+        timesteps = paddle.to_tensor([2.0, 3.0])
+
+        # first order uses the last occurrence
+        noisy = scheduler.add_noise(original_samples, noise, timesteps)
+        assert noisy.flatten().tolist() == [2.0, 4.0]
+
+        # second order uses the first occurrence
+        scheduler.dt = 1.0
+        noisy = scheduler.add_noise(original_samples, noise, timesteps)
+        assert noisy.flatten().tolist() == [3.0, 4.0]
+
+        with self.assertRaises(IndexError):
+            scheduler.add_noise(original_samples, noise,
+                                paddle.to_tensor([2.0, 5.0]))
@@ -12,45 +12,73 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import copy
+import functools
 import tempfile
 import unittest
 
 import numpy as np
 import paddle
+from parameterized import parameterized
 
 from ppdiffusers import ScoreSdeVeScheduler
 
 
+@functools.lru_cache(maxsize=16)
+def _load_saved_config(scheduler_class, config_items):
+    # the reloaded config only depends on the original one, every config is saved and loaded once
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        scheduler_class(**dict(config_items)).save_config(tmpdirname)
+        return scheduler_class.load_config(tmpdirname)
+
+
+def reload_scheduler(scheduler_class, config_items):
+    # a new scheduler per call, the tests change the state of their schedulers with `set_timesteps`/`set_sigmas`
+    return scheduler_class.from_config(
+        copy.deepcopy(_load_saved_config(scheduler_class, config_items)))
+
+
 class ScoreSdeVeSchedulerTest(unittest.TestCase):
     # TODO adapt with class SchedulerCommonTest (scheduler needs Numpy Integration)
     scheduler_classes = (ScoreSdeVeScheduler, )
     forward_default_kwargs = ()
+    _dummy_sample = None
+    _dummy_sample_deter = None
 
     @property
     def dummy_sample(self):
-        batch_size = 4
-        num_channels = 3
-        height = 8
-        width = 8
+        # the samples are only read by the tests, they are built once with numpy and copied to paddle in one go
+        cls = type(self)
+        if cls._dummy_sample is None:
+            batch_size = 4
+            num_channels = 3
+            height = 8
+            width = 8
 
-        sample = paddle.rand((batch_size, num_channels, height, width))
+            cls._dummy_sample = paddle.to_tensor(
+                np.random.rand(batch_size, num_channels, height, width)
+                .astype(np.float32))
 
-        return sample
+        return cls._dummy_sample
 
     @property
     def dummy_sample_deter(self):
-        batch_size = 4
-        num_channels = 3
-        height = 8
-        width = 8
+        cls = type(self)
+        if cls._dummy_sample_deter is None:
+            batch_size = 4
+            num_channels = 3
+            height = 8
+            width = 8
 
-        num_elems = batch_size * num_channels * height * width
-        sample = paddle.arange(num_elems)
-        sample = sample.reshape([num_channels, height, width, batch_size])
-        sample = sample / num_elems
-        sample = sample.transpose([3, 0, 1, 2])
+            num_elems = batch_size * num_channels * height * width
+            sample = np.arange(num_elems, dtype=np.float32)
+            sample = sample.reshape([num_channels, height, width, batch_size])
+            sample = sample / num_elems
+            sample = sample.transpose([3, 0, 1, 2])
 
-        return sample
+            cls._dummy_sample_deter = paddle.to_tensor(sample)
+
+        return cls._dummy_sample_deter
 
     def dummy_model(self):
         def model(sample, t, *args):
@@ -76,25 +104,26 @@ class ScoreSdeVeSchedulerTest(unittest.TestCase):
         for scheduler_class in self.scheduler_classes:
             sample = self.dummy_sample
             residual = 0.1 * sample
+            # one generator is reseeded before every step instead of creating a new one
+            generator = paddle.Generator()
 
             scheduler_config = self.get_scheduler_config(**config)
             scheduler = scheduler_class(**scheduler_config)
 
-            with tempfile.TemporaryDirectory() as tmpdirname:
-                scheduler.save_config(tmpdirname)
-                new_scheduler = scheduler_class.from_pretrained(tmpdirname)
+            new_scheduler = reload_scheduler(
+                scheduler_class, tuple(sorted(scheduler_config.items())))
 
             output = scheduler.step_pred(
                 residual,
                 time_step,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
             new_output = new_scheduler.step_pred(
                 residual,
                 time_step,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
 
             assert (paddle.sum(paddle.abs(output - new_output)) < 1e-5
@@ -103,12 +132,12 @@ class ScoreSdeVeSchedulerTest(unittest.TestCase):
             output = scheduler.step_correct(
                 residual,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
             new_output = new_scheduler.step_correct(
                 residual,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
 
             assert (paddle.sum(paddle.abs(output - new_output)) < 1e-5
@@ -121,25 +150,25 @@ class ScoreSdeVeSchedulerTest(unittest.TestCase):
         for scheduler_class in self.scheduler_classes:
             sample = self.dummy_sample
             residual = 0.1 * sample
+            generator = paddle.Generator()
 
             scheduler_config = self.get_scheduler_config()
             scheduler = scheduler_class(**scheduler_config)
 
-            with tempfile.TemporaryDirectory() as tmpdirname:
-                scheduler.save_config(tmpdirname)
-                new_scheduler = scheduler_class.from_pretrained(tmpdirname)
+            new_scheduler = reload_scheduler(
+                scheduler_class, tuple(sorted(scheduler_config.items())))
 
             output = scheduler.step_pred(
                 residual,
                 time_step,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
             new_output = new_scheduler.step_pred(
                 residual,
                 time_step,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
 
             assert (paddle.sum(paddle.abs(output - new_output)) < 1e-5
@@ -148,28 +177,29 @@ class ScoreSdeVeSchedulerTest(unittest.TestCase):
             output = scheduler.step_correct(
                 residual,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
             new_output = new_scheduler.step_correct(
                 residual,
                 sample,
-                generator=paddle.Generator().manual_seed(0),
+                generator=generator.manual_seed(0),
                 **kwargs).prev_sample
 
             assert (paddle.sum(paddle.abs(output - new_output)) < 1e-5
                     ), "Scheduler correction are not identical"
 
-    def test_timesteps(self):
-        for timesteps in [10, 100, 1000]:
-            self.check_over_configs(num_train_timesteps=timesteps)
+    # every value is its own test, so they can be scheduled on parallel workers
+    @parameterized.expand([10, 100, 1000])
+    def test_timesteps(self, timesteps):
+        self.check_over_configs(num_train_timesteps=timesteps)
 
-    def test_sigmas(self):
-        for sigma_min, sigma_max in zip([0.0001, 0.001, 0.01], [1, 100, 1000]):
-            self.check_over_configs(sigma_min=sigma_min, sigma_max=sigma_max)
+    @parameterized.expand([(0.0001, 1), (0.001, 100), (0.01, 1000)])
+    def test_sigmas(self, sigma_min, sigma_max):
+        self.check_over_configs(sigma_min=sigma_min, sigma_max=sigma_max)
 
-    def test_time_indices(self):
-        for t in [0.1, 0.5, 0.75]:
-            self.check_over_forward(time_step=t)
+    @parameterized.expand([0.1, 0.5, 0.75])
+    def test_time_indices(self, t):
+        self.check_over_forward(time_step=t)
 
     def test_full_loop_no_noise(self):
         kwargs = dict(self.forward_default_kwargs)
@@ -186,23 +216,24 @@ class ScoreSdeVeSchedulerTest(unittest.TestCase):
         scheduler.set_sigmas(num_inference_steps)
         scheduler.set_timesteps(num_inference_steps)
         generator = paddle.Generator().manual_seed(0)
+        # the sigmas are read on the host once instead of indexing the tensor in every step
+        sigmas = scheduler.sigmas.numpy().tolist()
 
-        for i, t in enumerate(scheduler.timesteps):
-            sigma_t = scheduler.sigmas[i]
+        with paddle.no_grad():
+            for i, t in enumerate(scheduler.timesteps):
+                sigma_t = sigmas[i]
 
-            for _ in range(scheduler.config.correct_steps):
-                with paddle.no_grad():
+                for _ in range(scheduler.config.correct_steps):
                     model_output = model(sample, sigma_t)
-                sample = scheduler.step_correct(
-                    model_output, sample, generator=generator,
-                    **kwargs).prev_sample
+                    sample = scheduler.step_correct(
+                        model_output, sample, generator=generator,
+                        **kwargs).prev_sample
 
-            with paddle.no_grad():
                 model_output = model(sample, sigma_t)
 
-            output = scheduler.step_pred(
-                model_output, t, sample, generator=generator, **kwargs)
-            sample, _ = output.prev_sample, output.prev_sample_mean
+                output = scheduler.step_pred(
+                    model_output, t, sample, generator=generator, **kwargs)
+                sample, _ = output.prev_sample, output.prev_sample_mean
 
         result_sum = paddle.sum(paddle.abs(sample))
         result_mean = paddle.mean(paddle.abs(sample))
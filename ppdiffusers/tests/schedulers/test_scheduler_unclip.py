@@ -15,6 +15,7 @@
 import paddle
 
 from ppdiffusers import UnCLIPScheduler
+from ppdiffusers.utils import randn_tensor
 
 from .test_schedulers import SchedulerCommonTest
 
@@ -157,6 +158,48 @@ class UnCLIPSchedulerTest(SchedulerCommonTest):
         assert abs(result_sum.item() - 249.76672363) < 1e-2
         assert abs(result_mean.item() - 0.32521713) < 1e-3
 
+    def test_step_tensor_matches_step(self):
+        scheduler_class = self.scheduler_classes[0]
+        for variance_type in ["fixed_small_log", "learned_range"]:
+            scheduler_config = self.get_scheduler_config(
+                variance_type=variance_type)
+            scheduler = scheduler_class(**scheduler_config)
+            scheduler.set_timesteps(25)
+            timesteps = scheduler.timesteps
+            step_indices = paddle.arange(timesteps.shape[0])
+
+            model = self.dummy_model()
+            sample = self.dummy_sample_deter
+            step_generator = paddle.Generator().manual_seed(0)
+            noise_generator = paddle.Generator().manual_seed(0)
+
+            for i, t in enumerate(timesteps):
+                residual = model(sample, t)
+                if variance_type == "learned_range":
+                    residual = paddle.concat(
+                        [residual, residual * 0.1], axis=1)
+
+                if i + 1 == timesteps.shape[0]:
+                    prev_timestep = None
+                    noise = None
+                else:
+                    prev_timestep = timesteps[i + 1]
+                    noise = randn_tensor(
+                        sample.shape,
+                        generator=noise_generator,
+                        dtype=sample.dtype)
+
+                expected = scheduler.step(
+                    residual,
+                    t,
+                    sample,
+                    prev_timestep=prev_timestep,
+                    generator=step_generator).prev_sample
+                result = scheduler.step_tensor(residual, step_indices[i],
+                                               sample, noise)
+                assert paddle.allclose(result, expected, atol=1e-4).item()
+                sample = expected
+
     def test_trained_betas(self):
         pass
 
@@ -13,17 +13,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import copy
+import functools
 import inspect
 import tempfile
 import unittest
+import weakref
 
-import numpy as np
 import paddle
 import paddle.nn as nn
-import requests
 from paddlenlp.transformers.opt.configuration import OPTConfig
-from PIL import Image
 
 from paddlemix.models.blip2 import (Blip2Config, Blip2ForConditionalGeneration,
                                     Blip2QFormerConfig, Blip2VisionConfig)
@@ -33,17 +31,46 @@ from paddlemix.models.blip2.modeling import \
 from paddlemix.models.blip2.Qformer import BertLMHeadModel
 from tests.models.test_configuration_common import ConfigTester
 from tests.models.test_modeling_common import (
-    ModelTesterMixin, floats_tensor, ids_tensor, random_attention_mask)
-from tests.testing_utils import slow
+    ModelTesterMixin, floats_tensor, random_attention_mask)
+from tests.testing_utils import get_bool_from_env, nightly, slow
 
+# skip `test_model_from_pretrained` instead of downloading the released checkpoints
+_skip_weight_load = get_bool_from_env("PADDLEMIX_SKIP_WEIGHT_LOAD")
+# run the forwards of `create_and_check_model` through `paddle.jit.to_static`, eager stays the default for debugging
+_run_to_static = get_bool_from_env("PADDLEMIX_TO_STATIC")
 
-def _config_zero_init(config):
-    configs_no_init = copy.deepcopy(config)
-    for key in configs_no_init.__dict__.keys():
-        if ("_range" in key or "_std" in key or "initializer_factor" in key or
-                "layer_scale" in key):
-            setattr(configs_no_init, key, 1e-10)
-    return configs_no_init
+
+# models for the tests that only inspect them, keyed by class and serialized config. tests that run or change the
+# weights build their own instance
+_MODEL_CACHE = {}
+
+
+def _get_cached_model(model_class, config):
+    key = (model_class, config.to_json_string())
+    if key not in _MODEL_CACHE:
+        _MODEL_CACHE[key] = model_class(config)
+    return _MODEL_CACHE[key]
+
+
+@functools.lru_cache(maxsize=None)
+def _forward_arg_names(model_class):
+    signature = inspect.signature(model_class.forward)
+    # signature.parameters is an OrderedDict => so arg_names order is deterministic, drop `self` of the unbound method
+    return [*signature.parameters.keys()][1:]
+
+
+# the `paddle.jit.to_static` functions of the models, built once per model. the models are weak keys, so a function
+# is dropped with its model and never served for a new model that reuses its id
+_STATIC_FORWARDS = weakref.WeakKeyDictionary()
+
+
+def _forward(model, *args, **kwargs):
+    if not _run_to_static:
+        return model(*args, **kwargs)
+    # conversion errors are raised, a model that cannot be converted fails the run instead of silently running eager
+    if model not in _STATIC_FORWARDS:
+        _STATIC_FORWARDS[model] = paddle.jit.to_static(model.forward)
+    return _STATIC_FORWARDS[model](*args, **kwargs)
 
 
 class Blip2VisionModelTester:
@@ -55,7 +82,7 @@ class Blip2VisionModelTester:
             patch_size=2,
             num_channels=3,
             is_training=True,
-            hidden_size=1408,
+            hidden_size=32,
             projection_dim=32,
             num_hidden_layers=5,
             num_attention_heads=4,
@@ -83,14 +110,20 @@ class Blip2VisionModelTester:
         # in ViT, the seq length equals the number of patches + 1 (we add 1 for the [CLS] token)
         num_patches = (image_size // patch_size)**2
         self.seq_length = num_patches + 1
+        self._config_and_inputs = None
 
     def prepare_config_and_inputs(self):
-        pixel_values = floats_tensor([
-            self.batch_size, self.num_channels, self.image_size, self.image_size
-        ])
-        config = self.get_config()
-
-        return config, pixel_values
+        # the inputs are built once per tester, every call gets its own copy of the tensors
+        if self._config_and_inputs is None:
+            pixel_values = floats_tensor([
+                self.batch_size, self.num_channels, self.image_size,
+                self.image_size
+            ])
+            config = self.get_config()
+            self._config_and_inputs = (config, pixel_values)
+        config, pixel_values = self._config_and_inputs
+
+        return config, pixel_values.clone()
 
     def get_config(self):
         return Blip2VisionConfig(
@@ -98,6 +131,7 @@ class Blip2VisionModelTester:
             patch_size=self.patch_size,
             num_channels=self.num_channels,
             hidden_size=self.hidden_size,
+            embed_dim=self.hidden_size,
             projection_dim=self.projection_dim,
             num_hidden_layers=self.num_hidden_layers,
             num_attention_heads=self.num_attention_heads,
@@ -110,7 +144,7 @@ class Blip2VisionModelTester:
         model = VisionTransformer(config=config)
         model.eval()
         with paddle.no_grad():
-            result = model(pixel_values)
+            result = _forward(model, pixel_values)
         # expected sequence length = num_patches + 1 (we add 1 for the [CLS] token)
         image_size = (self.image_size, self.image_size)
         patch_size = (self.patch_size, self.patch_size)
@@ -161,19 +195,14 @@ class Blip2VisionModelTest(ModelTesterMixin, unittest.TestCase):
         config, _ = self.model_tester.prepare_config_and_inputs_for_common()
 
         for model_class in self.all_model_classes:
-            model = model_class(config)
+            model = _get_cached_model(model_class, config)
             self.assertIsInstance(model.get_input_embeddings(), (nn.Layer))
             x = model.get_output_embeddings()
             self.assertTrue(x is None or isinstance(x, nn.Linear))
 
     def test_forward_signature(self):
-        config, _ = self.model_tester.prepare_config_and_inputs_for_common()
-
         for model_class in self.all_model_classes:
-            model = model_class(config)
-            signature = inspect.signature(model.forward)
-            # signature.parameters is an OrderedDict => so arg_names order is deterministic
-            arg_names = [*signature.parameters.keys()]
+            arg_names = _forward_arg_names(model_class)
 
             expected_arg_names = ["pixel_values"]
             self.assertListEqual(arg_names[:1], expected_arg_names)
@@ -184,9 +213,14 @@ class Blip2VisionModelTest(ModelTesterMixin, unittest.TestCase):
 
     @slow
     def test_model_from_pretrained(self):
+        if _skip_weight_load:
+            self.skipTest("PADDLEMIX_SKIP_WEIGHT_LOAD is set")
+
         for model_name in BLIP_2_PRETRAINED_MODEL_ARCHIVE_LIST[:1]:
             model = VisionTransformer.from_pretrained(model_name)
             self.assertIsNotNone(model)
+            # the tester uses a tiny hidden size, the released checkpoints keep the full width
+            self.assertEqual(model.num_features, 1408)
 
 
 class BertLMHeadModelTester:
@@ -199,9 +233,9 @@ class BertLMHeadModelTester:
             use_input_mask=True,
             use_labels=True,
             vocab_size=99,
-            hidden_size=768,
+            hidden_size=32,
             projection_dim=32,
-            num_hidden_layers=6,
+            num_hidden_layers=2,
             num_attention_heads=4,
             intermediate_size=37,
             dropout=0.1,
@@ -210,9 +244,10 @@ class BertLMHeadModelTester:
             initializer_range=0.02,
             bos_token_id=0,
             scope=None,
-            num_patches=257,
-            encoder_hidden_size=1408,
-            encoder_width=1408, ):
+            num_patches=16,
+            encoder_hidden_size=32,
+            encoder_width=32,
+            use_random_encoder_attention_mask=False, ):
         self.parent = parent
         self.batch_size = batch_size
         self.seq_length = seq_length
@@ -234,17 +269,29 @@ class BertLMHeadModelTester:
         self.num_patches = num_patches
         self.encoder_hidden_size = encoder_hidden_size
         self.encoder_width = encoder_width
+        self.use_random_encoder_attention_mask = use_random_encoder_attention_mask
+        self._config_and_inputs = None
 
     def prepare_config_and_inputs(self):
-        query_embeds = floats_tensor(
-            [self.batch_size, self.seq_length, self.hidden_size])
-        encoder_hidden_states = floats_tensor(
-            [self.batch_size, self.num_patches, self.encoder_hidden_size])
-        encoder_attention_mask = random_attention_mask(
-            [self.batch_size, self.num_patches])
-        config = self.get_config()
+        if self._config_and_inputs is None:
+            query_embeds = floats_tensor(
+                [self.batch_size, self.seq_length, self.hidden_size])
+            encoder_hidden_states = floats_tensor(
+                [self.batch_size, self.num_patches, self.encoder_hidden_size])
+            if self.use_random_encoder_attention_mask:
+                encoder_attention_mask = random_attention_mask(
+                    [self.batch_size, self.num_patches])
+            else:
+                # every patch is attended to, a single row broadcasts over the batch
+                encoder_attention_mask = paddle.ones(
+                    [1, self.num_patches], dtype="int32")
+            config = self.get_config()
+            self._config_and_inputs = (config, query_embeds,
+                                       encoder_hidden_states,
+                                       encoder_attention_mask)
+        config, *inputs = self._config_and_inputs
 
-        return config, query_embeds, encoder_hidden_states, encoder_attention_mask
+        return (config, *[x.clone() for x in inputs])
 
     def get_config(self):
         return Blip2QFormerConfig(
@@ -265,10 +312,12 @@ class BertLMHeadModelTester:
                                encoder_hidden_states, encoder_attention_mask):
         model = BertLMHeadModel(config=config, encoder_width=self.encoder_width)
         model.eval()
-        result = model(
-            query_embeds=query_embeds,
-            encoder_hidden_states=encoder_hidden_states,
-            encoder_attention_mask=encoder_attention_mask, )
+        with paddle.no_grad():
+            result = _forward(
+                model,
+                query_embeds=query_embeds,
+                encoder_hidden_states=encoder_hidden_states,
+                encoder_attention_mask=encoder_attention_mask, )
         self.parent.assertEqual(
             result.last_hidden_state.shape,
             [self.batch_size, self.seq_length, self.hidden_size], )
@@ -276,7 +325,8 @@ class BertLMHeadModelTester:
         model = BertLMHeadModel(config=config)
         model.eval()
         with paddle.no_grad():
-            result = model(
+            result = _forward(
+                model,
                 query_embeds,
                 encoder_hidden_states=encoder_hidden_states,
                 encoder_attention_mask=encoder_attention_mask, )
@@ -319,14 +369,19 @@ class BertLMHeadModelTest(ModelTesterMixin, unittest.TestCase):
     def test_config(self):
         self.config_tester.run_common_tests()
 
-    def test_forward_signature(self):
-        config, _ = self.model_tester.prepare_config_and_inputs_for_common()
+    def test_model(self):
+        config_and_inputs = self.model_tester.prepare_config_and_inputs()
+        self.model_tester.create_and_check_model(*config_and_inputs)
+
+    def test_model_with_encoder_attention_mask(self):
+        model_tester = BertLMHeadModelTester(
+            self, use_random_encoder_attention_mask=True)
+        config_and_inputs = model_tester.prepare_config_and_inputs()
+        model_tester.create_and_check_model(*config_and_inputs)
 
+    def test_forward_signature(self):
         for model_class in self.all_model_classes:
-            model = model_class(config)
-            signature = inspect.signature(model.forward)
-            # signature.parameters is an OrderedDict => so arg_names order is deterministic
-            arg_names = [*signature.parameters.keys()]
+            arg_names = _forward_arg_names(model_class)
 
             expected_arg_names = ["query_embeds"]
             self.assertListEqual(arg_names[:1], expected_arg_names)
@@ -385,14 +440,15 @@ class Blip2TextModelTester:
     def prepare_config_and_inputs(self):
         config = self.get_config()
 
-        input_ids = ids_tensor(
-            [self.batch_size, self.seq_length], self.vocab_size,
-            dtype="int64").clip(3, )
+        # sample above the special tokens directly instead of clipping afterwards
+        input_ids = paddle.randint(
+            low=3,
+            high=self.vocab_size,
+            shape=[self.batch_size, self.seq_length],
+            dtype="int64")
         input_ids[:, -1] = self.eos_token_id  # Eos Token
 
-        attention_mask = input_ids.not_equal(
-            paddle.to_tensor(
-                [self.pad_token_id], dtype="int64")).cast("int64")
+        attention_mask = (input_ids != self.pad_token_id).astype("int64")
 
         return config, input_ids, attention_mask
 
@@ -422,7 +478,10 @@ class Blip2ModelTester:
             qformer_kwargs=None,
             text_kwargs=None,
             is_training=True,
-            num_query_tokens=10, ):
+            num_query_tokens=10,
+            vision_tester=None,
+            qformer_tester=None,
+            text_tester=None, ):
         if vision_kwargs is None:
             vision_kwargs = {}
         if qformer_kwargs is None:
@@ -431,25 +490,36 @@ class Blip2ModelTester:
             text_kwargs = {}
 
         self.parent = parent
-        self.vision_model_tester = Blip2VisionModelTester(parent,
-                                                          **vision_kwargs)
-        self.qformer_model_tester = BertLMHeadModelTester(parent,
-                                                          **qformer_kwargs)
-        self.text_model_tester = Blip2TextModelTester(parent, **text_kwargs)
+        # prebuilt sub-testers are shared as is, the kwargs only apply to the ones built here
+        if vision_tester is None:
+            vision_tester = Blip2VisionModelTester(parent, **vision_kwargs)
+        if qformer_tester is None:
+            qformer_tester = BertLMHeadModelTester(parent, **qformer_kwargs)
+        if text_tester is None:
+            text_tester = Blip2TextModelTester(parent, **text_kwargs)
+        self.vision_model_tester = vision_tester
+        self.qformer_model_tester = qformer_tester
+        self.text_model_tester = text_tester
         self.is_training = is_training
         self.num_query_tokens = num_query_tokens
+        self._config_and_inputs = None
 
     def prepare_config_and_inputs(self):
-        _, pixel_values = self.vision_model_tester.prepare_config_and_inputs()
-        (
-            _,
-            input_ids,
-            attention_mask,
-        ) = self.text_model_tester.prepare_config_and_inputs()
-
-        config = self.get_config()
-
-        return config, input_ids, attention_mask, pixel_values
+        if self._config_and_inputs is None:
+            _, pixel_values = self.vision_model_tester.prepare_config_and_inputs(
+            )
+            (
+                _,
+                input_ids,
+                attention_mask,
+            ) = self.text_model_tester.prepare_config_and_inputs()
+
+            config = self.get_config()
+            self._config_and_inputs = (config, input_ids, attention_mask,
+                                       pixel_values)
+        config, *inputs = self._config_and_inputs
+
+        return (config, *[x.clone() for x in inputs])
 
     def get_config(self):
         return Blip2Config.from_vision_qformer_text_configs(
@@ -501,7 +571,14 @@ class Blip2ModelTest(ModelTesterMixin, unittest.TestCase):
     use_test_inputs_embeds: bool = False
 
     def setUp(self):
-        self.model_tester = Blip2ModelTester(self)
+        self.vision_model_tester = Blip2VisionModelTester(self)
+        self.qformer_model_tester = BertLMHeadModelTester(self)
+        self.text_model_tester = Blip2TextModelTester(self)
+        self.model_tester = Blip2ModelTester(
+            self,
+            vision_tester=self.vision_model_tester,
+            qformer_tester=self.qformer_model_tester,
+            text_tester=self.text_model_tester, )
 
     def test_for_conditional_generation(self):
         config_and_inputs = self.model_tester.prepare_config_and_inputs()
@@ -517,35 +594,34 @@ class Blip2ModelTest(ModelTesterMixin, unittest.TestCase):
         )
 
         def check_determinism(first, second):
-            out_1 = first.numpy()
-            out_2 = second.numpy()
-            out_1 = out_1[~np.isnan(out_1)]
-            out_2 = out_2[~np.isnan(out_2)]
-            max_diff = np.amax(np.abs(out_1 - out_2))
+            # reduce on device, only the max difference is copied back
+            is_nan = paddle.logical_or(
+                paddle.isnan(first), paddle.isnan(second))
+            diff = paddle.where(is_nan,
+                                paddle.zeros_like(first),
+                                (first - second).abs())
+            max_diff = diff.max().item()
             self.assertLessEqual(max_diff, 1e-5)
 
-        for model_class in self.all_model_classes:
-            model = self._make_model_instance(config, model_class)
-            model.eval()
-            with paddle.no_grad():
-                input = self._prepare_for_class(inputs_dict, model_class)
-                first = model(**input)["loss"]
-                second = model(**input)["loss"]
-
-            if isinstance(first, tuple) and isinstance(second, tuple):
-                for tensor1, tensor2 in zip(first, second):
-                    check_determinism(tensor1, tensor2)
-            else:
-                check_determinism(first, second)
+        with paddle.no_grad():
+            for model_class in self.all_model_classes:
+                # report every model class on its own, a failing class does not hide the later ones
+                with self.subTest(model_class=model_class.__name__):
+                    model = self._make_model_instance(config, model_class)
+                    model.eval()
+                    input = self._prepare_for_class(inputs_dict, model_class)
+                    first = model(**input)["loss"]
+                    second = model(**input)["loss"]
+
+                    if isinstance(first, tuple) and isinstance(second, tuple):
+                        for tensor1, tensor2 in zip(first, second):
+                            check_determinism(tensor1, tensor2)
+                    else:
+                        check_determinism(first, second)
 
     def test_forward_signature(self):
-        config, _ = self.model_tester.prepare_config_and_inputs_for_common()
-
         for model_class in self.all_model_classes:
-            model = model_class(config)
-            signature = inspect.signature(model.forward)
-            # signature.parameters is an OrderedDict => so arg_names order is deterministic
-            arg_names = [*signature.parameters.keys()]
+            arg_names = _forward_arg_names(model_class)
 
             expected_arg_names = ["pixel_values"]
             self.assertListEqual(arg_names[:1], expected_arg_names)
@@ -554,22 +630,29 @@ class Blip2ModelTest(ModelTesterMixin, unittest.TestCase):
         config, inputs_dict = self.model_tester.prepare_config_and_inputs_for_common(
         )
 
-        # Save Blip2Config and check if we can load Blip2VisionConfig from it
+        # Save Blip2Config and check if we can load Blip2VisionConfig and Blip2QFormerConfig from it
         with tempfile.TemporaryDirectory() as tmp_dir_name:
             config.save_pretrained(tmp_dir_name)
             vision_config = Blip2VisionConfig.from_pretrained(tmp_dir_name)
             self.assertDictEqual(config.vision_config.to_dict(),
                                  vision_config.to_dict())
 
-        # Save Blip2Config and check if we can load Blip2QFormerConfig from it
-        with tempfile.TemporaryDirectory() as tmp_dir_name:
-            config.save_pretrained(tmp_dir_name)
             qformer_config = Blip2QFormerConfig.from_pretrained(tmp_dir_name)
             self.assertDictEqual(config.qformer_config.to_dict(),
                                  qformer_config.to_dict())
 
     @slow
     def test_model_from_pretrained(self):
+        if _skip_weight_load:
+            self.skipTest("PADDLEMIX_SKIP_WEIGHT_LOAD is set")
+
+        for model_name in BLIP_2_PRETRAINED_MODEL_ARCHIVE_LIST[:1]:
+            model = Blip2ForConditionalGeneration.from_pretrained(model_name)
+            self.assertIsNotNone(model)
+
+    @slow
+    @nightly
+    def test_all_models_from_pretrained(self):
         for model_name in BLIP_2_PRETRAINED_MODEL_ARCHIVE_LIST:
             model = Blip2ForConditionalGeneration.from_pretrained(model_name)
             self.assertIsNotNone(model)
@@ -34,11 +34,16 @@ from tests.testing_utils import slow
 
 
 def _config_zero_init(config):
-    configs_no_init = copy.deepcopy(config)
-    for key in configs_no_init.__dict__.keys():
+    # a shallow copy is enough since only top level attributes are overridden, nested configs are copied the same way
+    # when they hold one of the keys
+    configs_no_init = copy.copy(config)
+    configs_no_init.__dict__ = dict(config.__dict__)
+    for key, value in configs_no_init.__dict__.items():
         if ("_range" in key or "_std" in key or "initializer_factor" in key or
                 "layer_scale" in key):
             setattr(configs_no_init, key, 1e-10)
+        elif isinstance(value, PretrainedConfig):
+            setattr(configs_no_init, key, _config_zero_init(value))
     return configs_no_init
 
 
@@ -61,7 +66,10 @@ def random_attention_mask(shape, dtype="int32"):
 
 def floats_tensor(shape, scale=1.0):
     """Creates a random float32 tensor"""
-    return scale * paddle.randn(shape, dtype="float32")
+    values = paddle.randn(shape, dtype="float32")
+    if scale != 1.0:
+        values = scale * values
+    return values
 
 
 def check_two_model_parameter(first_model: PretrainedModel,
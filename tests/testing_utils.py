@@ -65,3 +65,17 @@ def slow(test):
         return unittest.skip("test spends too much time")(test)
     else:
         return test
+
+
+_run_nightly_test = get_bool_from_env("RUN_NIGHTLY_TEST")
+
+
+def nightly(test):
+    """
+    Mark a test which only runs in the nightly CI.
+    Nightly tests are skipped by default. Excute the command `export RUN_NIGHTLY_TEST=True` to run them.
+    """
+    if not _run_nightly_test:
+        return unittest.skip("test is part of the nightly suite")(test)
+    else:
+        return test